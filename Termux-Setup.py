@@ -6,7 +6,7 @@ Termux Power Suite (auto-heavy mode, retry + self-update on failure).
 Preserves original features, adds:
  - Auto-Correct Engine (command typo fix + package-name fuzzy-match via pkg search)
  - Modes: silent (auto) / ask (interactive) / ai (interactive with GitHub search)
- - Rollback notifications and auto-start auto-maintain on shell open
+ - Rollback notifications and auto-start auto-maintain on shell open (once a day)
 
 Usage:
   - Set AUTO_CORRECT_MODE environment variable:
@@ -14,6 +14,12 @@ Usage:
       export AUTO_CORRECT_MODE=ask      # interactive mode (will prompt)
       export AUTO_CORRECT_MODE=ai       # interactive + GitHub candidate search
   - Optionally set GITHUB_TOKEN to reduce API rate-limits for GitHub search
+  - TOOL_PARALLELISM sets how many tools-list entries the tool manager
+    processes at once (default 8; also read by the generated script)
+  - Package installation is skipped if it completed less than an hour ago;
+    export FORCE_INSTALL=1 to run it anyway
+  - 'pkg update'/'pkg upgrade' are skipped while the apt index / last upgrade
+    is fresh; export FORCE_REFRESH=1 to run both anyway
   - Run: python3 termux-power-suite.py
 """
 from __future__ import annotations
@@ -22,32 +28,78 @@ import os
 import sys
 import subprocess
 import shlex
+import re
 import shutil
 import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import difflib
 import json
+import hashlib
+import http.client
+import urllib.parse
+import urllib.request
+import atexit
+import signal
+import functools
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from datetime import datetime
-from typing import List, Tuple, Dict, Optional
+from types import MappingProxyType
+from collections import deque
+from typing import Callable, List, Tuple, Dict, Optional, Iterable
+
+try:
+    # optional C++ fuzzy matcher; falls back to difflib when missing (minimal Termux installs)
+    from rapidfuzz import process as rf_process, fuzz as rf_fuzz
+except ImportError:
+    rf_process = None
 
 # ---------------- User-tweakable constants ----------------
 MAX_RETRIES = 3            # how many times to try a failed command
-BACKOFF_BASE = 4           # seconds; backoff = BACKOFF_BASE * (2 ** (attempt-1))
+BACKOFF_MIN = 0.5          # seconds; first retry delay (before jitter)
+BACKOFF_BASE = 1.6         # growth factor; delay = min(BACKOFF_MAX, BACKOFF_MIN * BACKOFF_BASE ** (attempt-1)) * jitter
+BACKOFF_MAX = 60           # seconds; cap for a single backoff
+LOCK_BACKOFF = 30          # seconds; wait when apt/dpkg lock is held by another process
 CMD_TIMEOUT = 900          # seconds timeout for heavy commands (15 minutes)
-LOG_ROTATE_BYTES = 8_000_000  # rotate logs if exceed ~8MB
+LOG_ROTATE_BYTES = 4_000_000  # rotate each category log (keeping 5 backups) once it exceeds ~4MB
 
 # Auto-correct/config
 AUTO_CORRECT_MODE = os.environ.get("AUTO_CORRECT_MODE", "silent").lower()  # 'silent'|'ask'|'ai'
 PKG_NAME_CONFIDENCE = 0.72  # cutoff for fuzzy match when choosing package name candidates
+PKG_SEARCH_CACHE_TTL = 86400  # seconds; reuse persisted 'pkg search' results for a day
+PKG_SEARCH_MAX_CANDIDATES = 50  # stop reading 'pkg search' output after this many names
+PKGNAMES_CACHE_TTL = 6 * 3600  # seconds; reuse the persisted 'apt-cache pkgnames' list
+
+# Skip repeated refreshes on warm runs
+APT_UPDATE_MAX_AGE = 6 * 3600   # seconds; skip 'pkg update' if the apt index is younger
+UPGRADE_MAX_AGE = 24 * 3600     # seconds; skip 'pkg upgrade' if the last upgrade is younger
+INSTALL_MARKER_TTL = 3600       # seconds; skip install_packages() if it completed more recently
+FORCE_INSTALL = os.environ.get("FORCE_INSTALL", "") == "1"  # bypass INSTALL_MARKER_TTL
+FORCE_REFRESH = os.environ.get("FORCE_REFRESH", "") == "1"  # bypass APT_UPDATE_MAX_AGE and UPGRADE_MAX_AGE
+PKG_CHUNK_SIZE = 25             # packages per 'pkg install' transaction
+DEB_PREFETCH_WORKERS = 8        # concurrent .deb downloads into apt's cache before installing
 
 # GitHub search limits
 GITHUB_PER_PAGE = 30  # number of repos per GitHub page (use 30 default)
 GITHUB_SEARCH_LIMIT = 120  # total limit we'll fetch at most (paged)
+GITHUB_CACHE_TTL = 1800  # seconds; serve cached search pages without revalidating
+GITHUB_API_HOST = "api.github.com"
+GIT_CLONE_WORKERS = 4  # concurrent clones for interactive 'git' actions
+try:
+    TOOL_PARALLELISM = max(1, int(os.environ.get("TOOL_PARALLELISM", "8")))  # default concurrent entries in termux-tool-manager.sh
+except ValueError:
+    TOOL_PARALLELISM = 8
 
 # ----------------------------------------------------------
 
 HOME = Path.home()
-LOGFILE = HOME / "termux-full-setup.log"
+PREFIX = Path(os.environ.get("PREFIX", "/data/data/com.termux/files/usr"))
+LOG_DIR = HOME / "logs"
+LOG_CATEGORIES = ("install", "autocorrect", "interactive")  # one LOG_DIR/<category>.log each
+LOGFILE = HOME / "termux-full-setup.log"  # symlink to LOG_DIR/install.log
 TOOLS_DIR = HOME / "tools"
 TOOL_LIST = HOME / "tools-list.txt"
 BACKUP_DIR = HOME / "tool-backups"
@@ -55,34 +107,91 @@ SELF_UPDATE_SCRIPT = HOME / "termux-self-update.sh"
 TOOL_MANAGER_SCRIPT = HOME / "termux-tool-manager.sh"
 AUTO_MAINTAIN_SCRIPT = HOME / "termux-auto-maintain.sh"
 BASHRC = HOME / ".bashrc"
+BASHRC_MARKER = HOME / ".tps-bashrc-installed"
+PKG_SEARCH_CACHE = HOME / ".tps-pkgsearch.json"
+UPGRADE_MARKER = HOME / ".tps-last-upgrade"
+INSTALL_MARKER = HOME / ".tps-install-done"
+APT_LISTS_DIR = PREFIX / "var" / "lib" / "apt" / "lists"
+APT_CONF_FILE = PREFIX / "etc" / "apt" / "apt.conf.d" / "99termux-power-suite"
+APT_ARCHIVES_DIR = PREFIX / "var" / "cache" / "apt" / "archives"
+GH_CACHE_DIR = HOME / ".cache" / "termux-power-suite" / "gh"
+PKGNAMES_CACHE = HOME / ".cache" / "termux-power-suite" / "pkgnames.txt"
+STEP_MARKER_DIR = HOME / ".cache" / "termux-power-suite" / "done"  # run_install_steps(remember=True)
+
+# inherited by every apt/dpkg child: no debconf dialogs, changelog pagers or restart prompts
+os.environ.update({"DEBIAN_FRONTEND": "noninteractive", "APT_LISTCHANGES_FRONTEND": "none", "NEEDRESTART_MODE": "a"})
 
 # ---------------------------------------------------------------------------
 # Helper utilities
 # ---------------------------------------------------------------------------
-def ts() -> str:
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+_logger = logging.getLogger("tps")
+_category_loggers: Dict[str, logging.Logger] = {}
 
 
-def log(msg: str, to_console: bool = True) -> None:
-    line = f"[{ts()}] {msg}"
+def _link_logfile() -> None:
+    """Point LOGFILE at the install log (an old plain-file LOGFILE is moved into LOG_DIR)."""
+    target = LOG_DIR / "install.log"
     try:
-        with open(LOGFILE, "a", encoding="utf-8") as f:
-            f.write(line + "\n")
-    except Exception:
-        # don't crash on logging errors
-        pass
-    if to_console:
-        print(line)
+        if LOGFILE.is_symlink():
+            if Path(os.readlink(LOGFILE)) == target:
+                return
+            LOGFILE.unlink()
+        elif LOGFILE.exists():
+            LOGFILE.rename(LOG_DIR / LOGFILE.name)
+        LOGFILE.symlink_to(target)
+    except OSError as e:
+        print(f"[!] Could not link {LOGFILE} -> {target}: {e}")
 
 
-def rotate_logs(max_size: int = LOG_ROTATE_BYTES) -> None:
+def _init_logging() -> None:
+    """
+    Each category in LOG_CATEGORIES logs to its own size-rotated LOG_DIR/<category>.log
+    through one open handle; the console only gets records logged with to_console=True.
+    File writes happen on a QueueListener thread, so log() only enqueues the record;
+    console output stays synchronous to keep it in order with prompts.
+    """
+    if _logger.handlers:
+        return
+    _logger.setLevel(logging.INFO)
+    _logger.propagate = False
+    fmt = logging.Formatter("[%(asctime)s] %(message)s", "%Y-%m-%d %H:%M:%S")
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(fmt)
+    console.addFilter(lambda record: getattr(record, "console", True))
+    _logger.addHandler(console)
     try:
-        if LOGFILE.exists() and LOGFILE.stat().st_size > max_size:
-            new_name = LOGFILE.with_name(f"termux-full-setup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.log")
-            LOGFILE.rename(new_name)
-            log(f"Rotated log to {new_name}", to_console=False)
-    except Exception as e:
-        log(f"Log rotation error: {e}", to_console=False)
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        print(f"[!] Could not create {LOG_DIR}: {e}")
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    file_handlers: List[logging.Handler] = []
+    for category in LOG_CATEGORIES:
+        # child loggers queue the record for their file, then propagate to the console handler on "tps"
+        logger = _logger.getChild(category)
+        try:
+            fh = RotatingFileHandler(str(LOG_DIR / f"{category}.log"), maxBytes=LOG_ROTATE_BYTES, backupCount=5,
+                                     encoding="utf-8", delay=True)
+            fh.setFormatter(fmt)
+            # the listener hands every record to every handler; keep each file to its own category
+            fh.addFilter(logging.Filter(logger.name))
+            file_handlers.append(fh)
+            logger.addHandler(QueueHandler(log_queue))
+        except OSError as e:
+            print(f"[!] Could not open {category} log: {e}")
+        _category_loggers[category] = logger
+    if file_handlers:
+        listener = QueueListener(log_queue, *file_handlers)
+        listener.start()
+        # registered before any other exit hook, so it runs last and flushes their records too
+        atexit.register(listener.stop)
+    _link_logfile()
+
+
+_init_logging()
+
+
+def log(msg: str, to_console: bool = True, category: str = "install") -> None:
+    _category_loggers.get(category, _category_loggers["install"]).info(msg, extra={"console": to_console})
 
 
 def run_raw(cmd_list, check=False, capture=False, timeout=None, env=None):
@@ -113,9 +222,104 @@ def run_raw(cmd_list, check=False, capture=False, timeout=None, env=None):
         raise
 
 
-def run_with_retry(cmd: str, max_retries: int = MAX_RETRIES, timeout: int = CMD_TIMEOUT) -> subprocess.CompletedProcess:
+def run_logged(argv: List[str], timeout: Optional[float] = None, check: bool = False, cwd: Optional[Path] = None) -> int:
+    """
+    Run argv (no shell), streaming its combined stdout/stderr into LOGFILE line by line.
+    Returns the exit code. With check=True a non-zero exit raises CalledProcessError
+    carrying the last lines of output (so failure markers can be matched).
+    Raises TimeoutExpired when the process is killed after `timeout` seconds.
+    """
+    log(f"EXEC: {shlex.join(argv)}", to_console=False)
+    proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                            errors="replace", bufsize=1, cwd=cwd)
+    timed_out = threading.Event()
+
+    def _kill() -> None:
+        timed_out.set()
+        proc.kill()
+
+    killer = threading.Timer(timeout, _kill) if timeout else None
+    tail: deque = deque(maxlen=50)
+    try:
+        if killer:
+            killer.start()
+        for line in proc.stdout:
+            line = line.rstrip()
+            tail.append(line)
+            log(line, to_console=False)
+        rc = proc.wait()
+    finally:
+        if killer:
+            killer.cancel()
+        proc.stdout.close()
+    output = "\n".join(tail)
+    if timed_out.is_set():
+        log(f"TimeoutExpired after {timeout}s: {shlex.join(argv)}", to_console=True)
+        raise subprocess.TimeoutExpired(argv, timeout, output=output)
+    if check and rc != 0:
+        raise subprocess.CalledProcessError(rc, argv, output=output)
+    return rc
+
+
+# failure output markers: lock contention waits longer, permanent failures aren't retried
+LOCK_FAILURE_MARKERS = ("Could not get lock", "Unable to acquire the dpkg frontend lock", "Unable to lock")
+PERMANENT_FAILURE_MARKERS = (
+    "command not found",
+    "Unable to locate package",      # bad package name: retrying won't make it exist
+    "dpkg was interrupted",          # needs a manual 'dpkg --configure -a'
+)
+
+
+def failure_output(exc: BaseException) -> str:
+    """Combined stdout/stderr text carried by a subprocess exception (empty if none)."""
+    parts = []
+    for attr in ("stdout", "stderr"):
+        val = getattr(exc, attr, None)
+        if isinstance(val, bytes):
+            val = val.decode(errors="replace")
+        if val:
+            parts.append(val)
+    return "\n".join(parts)
+
+
+def is_permanent_failure(exc: BaseException) -> bool:
+    """True when retrying can't help (missing binary, unknown package, broken dpkg state)."""
+    if isinstance(exc, FileNotFoundError):
+        return True
+    if getattr(exc, "returncode", None) == 127:
+        return True
+    out = failure_output(exc)
+    return any(m in out for m in PERMANENT_FAILURE_MARKERS)
+
+
+def is_lock_failure(exc: BaseException) -> bool:
+    out = failure_output(exc)
+    return any(m in out for m in LOCK_FAILURE_MARKERS)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Truncated exponential backoff with jitter (0.5x-1.5x) for the given 1-based attempt."""
+    delay = min(BACKOFF_MAX, BACKOFF_MIN * (BACKOFF_BASE ** (attempt - 1)))
+    return delay * (0.5 + random.random())
+
+
+@functools.lru_cache(maxsize=None)
+def have(cmd: str) -> bool:
+    """shutil.which(cmd), probed once; call have.cache_clear() after installing things."""
+    return shutil.which(cmd) is not None
+
+
+@functools.lru_cache(maxsize=1)
+def self_update_ready() -> bool:
+    # create_self_update() clears this after (re)writing the script
+    return SELF_UPDATE_SCRIPT.exists() and os.access(SELF_UPDATE_SCRIPT, os.X_OK)
+
+
+def _retrying(desc: str, run_once: Callable[[], object], max_retries: int):
     """
-    Run a shell command (string via bash -lc). On failure, call self-update and retry.
+    Call run_once() until it succeeds. On failure, call self-update and retry
+    with exponential backoff; lock contention waits LOCK_BACKOFF, permanent failures
+    (see is_permanent_failure) are not retried.
     Raises RuntimeError if all retries exhausted.
     """
     attempt = 0
@@ -123,47 +327,112 @@ def run_with_retry(cmd: str, max_retries: int = MAX_RETRIES, timeout: int = CMD_
     while attempt < max_retries:
         attempt += 1
         try:
-            log(f"[run_with_retry] Attempt {attempt}/{max_retries} -> {cmd}")
-            # run via bash to preserve shell features used in commands
-            cp = run_raw(["bash", "-lc", cmd], check=True, capture=True, timeout=timeout)
+            log(f"[run_with_retry] Attempt {attempt}/{max_retries} -> {desc}")
+            result = run_once()
             log(f"[run_with_retry] Success on attempt {attempt}")
-            return cp
-        except Exception as e:
+            return result
+        except (OSError, subprocess.SubprocessError) as e:
             last_exc = e
             log(f"[run_with_retry] Failure on attempt {attempt}: {e}", to_console=True)
+            if is_permanent_failure(e):
+                log("[run_with_retry] Permanent failure, not retrying.", to_console=True)
+                break
+            if is_lock_failure(e) and attempt < max_retries:
+                # another apt/dpkg holds the lock: self-update would just hit it too
+                log(f"[run_with_retry] Package manager locked, waiting {LOCK_BACKOFF}s before retry...")
+                time.sleep(LOCK_BACKOFF)
+                continue
             # if not last attempt, try self-update then backoff
             if attempt < max_retries:
                 try:
                     log("[run_with_retry] Running self-update (best-effort) before next retry...")
-                    # run self-update script if exists and executable; don't raise on failure
-                    if Path(SELF_UPDATE_SCRIPT).exists() and os.access(SELF_UPDATE_SCRIPT, os.X_OK):
-                        run_raw(["bash", "-lc", f"bash {shlex.quote(str(SELF_UPDATE_SCRIPT))}"], check=False, capture=True, timeout=120)
-                    else:
-                        # fallback: run lightweight pkg update to refresh repos
-                        run_raw(["bash", "-lc", "pkg update -y >/dev/null 2>&1 || true"], check=False, capture=True, timeout=120)
-                except Exception as se:
+                    # self-update runs apt/dpkg: hold PKG_LOCK so it never overlaps a pkg install
+                    # running in another group (re-entrant for retries inside the pkg group)
+                    with PKG_LOCK:
+                        # run self-update script if exists and executable; don't raise on failure
+                        if self_update_ready():
+                            run_raw(["bash", str(SELF_UPDATE_SCRIPT)], check=False, capture=True, timeout=120)
+                        else:
+                            # fallback: run lightweight pkg update to refresh repos
+                            run_raw(["pkg", "update", "-y"], check=False, capture=True, timeout=120)
+                except (OSError, subprocess.SubprocessError) as se:
                     log(f"[run_with_retry] self-update attempt raised: {se}", to_console=False)
-                backoff = BACKOFF_BASE * (2 ** (attempt - 1))
-                log(f"[run_with_retry] Backing off {backoff}s before retry...")
+                backoff = backoff_delay(attempt)
+                log(f"[run_with_retry] Backing off {backoff:.1f}s before retry...")
                 time.sleep(backoff)
             else:
                 log("[run_with_retry] Max retries reached, giving up.", to_console=True)
     # after loop
-    raise RuntimeError(f"Command failed after {max_retries} attempts: {cmd}") from last_exc
+    raise RuntimeError(f"Command failed after {attempt} attempt(s): {desc}") from last_exc
+
+
+def run_with_retry_argv(argv: List[str], max_retries: int = MAX_RETRIES, timeout: int = CMD_TIMEOUT,
+                        cwd: Optional[Path] = None) -> int:
+    """Run argv via run_logged (output streamed into LOGFILE) with _retrying's retry/backoff policy."""
+    return _retrying(shlex.join(argv), lambda: run_logged(argv, timeout=timeout, check=True, cwd=cwd), max_retries)
 
 
 def ensure_dirs() -> None:
     try:
         TOOLS_DIR.mkdir(parents=True, exist_ok=True)
         BACKUP_DIR.mkdir(parents=True, exist_ok=True)
-    except Exception as e:
+    except OSError as e:
         log(f"Could not ensure directories: {e}", to_console=True)
 
+def write_exec(path: Path, content: str) -> None:
+    """Write an executable script with one unbuffered write (mode 0755, also fixed on an existing file)."""
+    fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o755)
+    try:
+        os.fchmod(fd, 0o755)
+        os.write(fd, content.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+# one lock per package manager so two installs of the same kind never overlap;
+# PKG_LOCK is re-entrant: _retrying takes it for self-update, also inside pkg steps holding it
+PKG_LOCK = threading.RLock()
+PIP_LOCK = threading.Lock()
+NPM_LOCK = threading.Lock()
+GEM_LOCK = threading.Lock()
+
+def unique(items: Iterable[str]) -> List[str]:
+    """Drop duplicates, keeping first-seen order (avoids redundant installs/clones)."""
+    return list(dict.fromkeys(items))
+
+def bare_name(spec: str) -> str:
+    """Package name without version pin or extras: 'requests==2.31' -> 'requests', 'git=2.45' -> 'git'."""
+    return re.split(r"[=<>!~\[;@ ]", spec, maxsplit=1)[0]
+
+def _pip_canonical(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+def unique_pinned(specs: Iterable[str], key: Callable[[str], str] = str.lower) -> List[str]:
+    """
+    unique() keyed on the bare package name: first-seen order, but the last spec for
+    a name (pinned or not) wins, so 'x', 'x==1.0' collapses to 'x==1.0'.
+    """
+    chosen: Dict[str, str] = {}
+    for spec in specs:
+        chosen[key(bare_name(spec))] = spec
+    return list(chosen.values())
+
+def closest_match(query: str, choices: Iterable[str], cutoff: float) -> Optional[str]:
+    """
+    Return the best fuzzy match for query among choices, or None below cutoff (0..1).
+    Uses rapidfuzz when installed, otherwise difflib (same similarity ratio).
+    """
+    if rf_process is not None:
+        best = rf_process.extractOne(query, choices, scorer=rf_fuzz.ratio, processor=None, score_cutoff=cutoff * 100)
+        return best[0] if best else None
+    match = difflib.get_close_matches(query, choices, n=1, cutoff=cutoff)
+    return match[0] if match else None
+
 # ---------------------------------------------------------------------------
 # Auto-Correct Engine (command token fixes + package-name fuzzy-match)
 # ---------------------------------------------------------------------------
 CANONICAL_COMMANDS = {
     "apt": "apt",
+    "apt-get": "apt-get",
     "pkg": "pkg",
     "pip": "pip",
     "python": "python",
@@ -210,137 +479,310 @@ COMMON_TOKEN_CORRECTIONS = {
     "lsa": "ls -a",
 }
 
+# one read-only exact-match table (typo corrections win over canonical names),
+# and the fuzzy-match corpus, both built once at import
+_EXACT = MappingProxyType({**CANONICAL_COMMANDS, **COMMON_TOKEN_CORRECTIONS})
+_ALL_KEYS = tuple(_EXACT)
+
+@functools.lru_cache(maxsize=64)
+def _keys_near_length(n: int, cutoff: float) -> Tuple[str, ...]:
+    """
+    Keys that can still reach `cutoff` against a token of length n.
+    The ratio is 2*matches/(len(a)+len(b)) and matches <= the shorter length,
+    so every key outside this length band would be rejected anyway.
+    """
+    return tuple(k for k in _ALL_KEYS if 2 * min(len(k), n) / (len(k) + n) >= cutoff)
+
+@functools.lru_cache(maxsize=1024)
 def smart_fix_token(token: str) -> str:
-    if token in COMMON_TOKEN_CORRECTIONS:
-        return COMMON_TOKEN_CORRECTIONS[token]
-    if token in CANONICAL_COMMANDS:
-        return CANONICAL_COMMANDS[token]
-    choices = list(CANONICAL_COMMANDS.keys()) + list(COMMON_TOKEN_CORRECTIONS.keys())
-    match = difflib.get_close_matches(token, choices, n=1, cutoff=0.78)
-    if match:
-        m = match[0]
-        if m in CANONICAL_COMMANDS:
-            return CANONICAL_COMMANDS[m]
-        return COMMON_TOKEN_CORRECTIONS.get(m, m)
+    hit = _EXACT.get(token)
+    if hit is not None:
+        return hit
+    # paths, URLs, flags, file names and numbers can't be meaningfully corrected
+    if token.startswith("-") or token.isdigit() or any(c in token for c in "/.:"):
+        return token
+    m = closest_match(token, _keys_near_length(len(token), 0.78), cutoff=0.78)
+    if m:
+        return _EXACT[m]
     return token
 
-def autocorrect_command(cmd: str) -> str:
+# arguments never corrected: flags, paths/URLs, assignments and $variables
+_SKIP_TOKEN_RE = re.compile(r"^-|[/=]|^\$")
+
+def autocorrect_command(cmd: str, parts: Optional[List[str]] = None) -> str:
+    """
+    Fix typos in the command word and its sub-commands.
+    `parts` may carry an existing cmd.split() to avoid splitting again.
+    Returns cmd itself (same object) when nothing needed correcting.
+    """
     original = cmd.strip()
     if not original:
         return cmd
 
-    parts = original.split()
-    parts[0] = smart_fix_token(parts[0])
-    for i in range(1, len(parts)):
-        token = parts[i]
-        if token.startswith("-") or "/" in token or "=" in token or token.startswith("$"):
+    parts = list(parts) if parts is not None else original.split()
+    changed = False
+    for i, token in enumerate(parts):
+        if i > 0 and _SKIP_TOKEN_RE.search(token):
             continue
-        parts[i] = smart_fix_token(parts[i])
-
-    corrected = " ".join(parts)
-    if corrected == original:
+        fixed = smart_fix_token(token)
+        if fixed != token:
+            parts[i] = fixed
+            changed = True
+        if i > 0 and fixed == "install":
+            # package names after the install verb are resolved by prepare_command_for_run
+            break
+
+    if not changed:
         return cmd
+    corrected = " ".join(parts)
 
     if AUTO_CORRECT_MODE == "silent":
-        log(f"[autocorrect] corrected (silent): '{original}' -> '{corrected}'")
+        log(f"[autocorrect] corrected (silent): '{original}' -> '{corrected}'", category="autocorrect")
         return corrected
     elif AUTO_CORRECT_MODE == "ask":
         try:
             reply = input(f"Did you mean: '{corrected}' (y/N)? ").strip().lower()
             if reply in ("y", "yes"):
-                log(f"[autocorrect] user-approved: '{original}' -> '{corrected}'")
+                log(f"[autocorrect] user-approved: '{original}' -> '{corrected}'", category="autocorrect")
                 return corrected
             else:
-                log(f"[autocorrect] user-declined correction for: '{original}'")
+                log(f"[autocorrect] user-declined correction for: '{original}'", category="autocorrect")
                 return original
         except Exception:
-            log(f"[autocorrect] could not prompt; leaving original: '{original}'", to_console=False)
+            log(f"[autocorrect] could not prompt; leaving original: '{original}'", to_console=False, category="autocorrect")
             return original
     elif AUTO_CORRECT_MODE == "ai":
         # in AI mode, we still show the corrected suggestion first and ask before auto-applying
         try:
             reply = input(f"Suggested correction: '{corrected}' — Apply? (y/N) or 'm' for menu: ").strip().lower()
             if reply in ("y", "yes"):
-                log(f"[autocorrect] user-approved (ai): '{original}' -> '{corrected}'")
+                log(f"[autocorrect] user-approved (ai): '{original}' -> '{corrected}'", category="autocorrect")
                 return corrected
             if reply == "m":
                 # 'm' will let caller handle interactive candidate resolution
                 return original
-            log(f"[autocorrect] user-declined correction for: '{original}'")
+            log(f"[autocorrect] user-declined correction for: '{original}'", category="autocorrect")
             return original
         except Exception:
-            log(f"[autocorrect] could not prompt; leaving original: '{original}'", to_console=False)
+            log(f"[autocorrect] could not prompt; leaving original: '{original}'", to_console=False, category="autocorrect")
             return original
     else:
-        log(f"[autocorrect] unknown AUTO_CORRECT_MODE='{AUTO_CORRECT_MODE}', defaulting to silent")
-        log(f"[autocorrect] corrected (default): '{original}' -> '{corrected}'")
+        log(f"[autocorrect] unknown AUTO_CORRECT_MODE='{AUTO_CORRECT_MODE}', defaulting to silent", category="autocorrect")
+        log(f"[autocorrect] corrected (default): '{original}' -> '{corrected}'", category="autocorrect")
         return corrected
 
 # ---------------------------------------------------------------------------
 # Package-name validation + fuzzy-match via repo search
 # ---------------------------------------------------------------------------
-def pkg_search_candidates(name: str) -> list[str]:
+_pkg_search_results: Optional[Dict[str, List[str]]] = None
+_pkg_search_created = 0.0
+
+
+def _pkg_search_disk_cache() -> Dict[str, List[str]]:
+    """Load persisted 'pkg search' results once per process (empty if missing or stale)."""
+    global _pkg_search_results, _pkg_search_created
+    if _pkg_search_results is None:
+        _pkg_search_results = {}
+        _pkg_search_created = time.time()
+        try:
+            with open(PKG_SEARCH_CACHE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            created = float(data.get("ts", 0))
+            if time.time() - created < PKG_SEARCH_CACHE_TTL:
+                _pkg_search_results = dict(data.get("results", {}))
+                _pkg_search_created = created
+        except (OSError, ValueError, TypeError, AttributeError):
+            pass
+    return _pkg_search_results
+
+
+@atexit.register
+def save_pkg_search_cache() -> None:
+    """Persist 'pkg search' results so the next run can skip the subprocess."""
+    if not _pkg_search_results:
+        return
+    try:
+        with open(PKG_SEARCH_CACHE, "w", encoding="utf-8") as f:
+            json.dump({"ts": _pkg_search_created, "results": _pkg_search_results}, f)
+    except (OSError, TypeError, ValueError) as e:
+        log(f"[pkg_search_candidates] could not save cache: {e}", to_console=False)
+
+
+@functools.lru_cache(maxsize=1)
+def all_pkg_names() -> Tuple[str, ...]:
     """
-    Use 'pkg search <name>' to obtain candidate package names.
-    Returns list of candidate package names (unique, ordered).
+    Every package name apt knows about, from one 'apt-cache pkgnames' call.
+    Persisted to PKGNAMES_CACHE; reused for PKGNAMES_CACHE_TTL unless the apt index is newer.
     """
     try:
-        out = subprocess.run(["bash", "-lc", f"pkg search {shlex.quote(name)}"], capture_output=True, text=True, timeout=20)
-        lines = out.stdout.splitlines()
-        candidates = []
-        for L in lines:
-            L = L.strip()
-            if not L:
-                continue
-            # line often like "neofetch - fetch system information"
-            tok = L.split()[0].strip()
-            if tok:
-                candidates.append(tok)
-        # deduplicate preserving order
-        seen = set()
-        uniq = []
-        for c in candidates:
-            if c not in seen:
-                seen.add(c)
-                uniq.append(c)
-        return uniq
-    except Exception as e:
+        age = time.time() - PKGNAMES_CACHE.stat().st_mtime
+        if age < PKGNAMES_CACHE_TTL and age < apt_index_age():
+            return tuple(PKGNAMES_CACHE.read_text(encoding="utf-8").split())
+    except OSError:
+        pass
+    try:
+        out = subprocess.run(["apt-cache", "pkgnames"], capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError) as e:
+        log(f"[all_pkg_names] apt-cache pkgnames failed: {e}", to_console=False)
+        return ()
+    names = tuple(sorted(set(out.stdout.split())))
+    if out.returncode == 0 and names:
+        try:
+            PKGNAMES_CACHE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = PKGNAMES_CACHE.with_suffix(".tmp")
+            tmp.write_text("\n".join(names) + "\n", encoding="utf-8")
+            os.replace(tmp, PKGNAMES_CACHE)
+        except OSError as e:
+            log(f"[all_pkg_names] cache write failed: {e}", to_console=False)
+    return names
+
+@functools.lru_cache(maxsize=1)
+def known_pkg_names() -> frozenset:
+    """all_pkg_names() as a set, for exact membership checks."""
+    return frozenset(all_pkg_names())
+
+@functools.lru_cache(maxsize=512)
+def pkg_search_candidates(name: str) -> Tuple[str, ...]:
+    """
+    Candidate package names for `name` (unique, ordered).
+    Names containing `name` are taken from all_pkg_names() in-process; 'pkg search <name>'
+    only runs when none match. Search results are memoized per process and persisted
+    to PKG_SEARCH_CACHE.
+    """
+    # shortest first: closest to the query, and kept when the list is capped
+    hits = sorted((p for p in all_pkg_names() if name in p), key=len)
+    if hits:
+        return tuple(hits[:PKG_SEARCH_MAX_CANDIDATES])
+    cache = _pkg_search_disk_cache()
+    if name in cache:
+        return tuple(cache[name])
+    try:
+        # stream the output and stop early; big result sets are never fully materialized
+        proc = subprocess.Popen(["pkg", "search", name], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        killer = threading.Timer(20, proc.kill)
+        killer.start()
+        found: Dict[str, None] = {}  # insertion-ordered dedup
+        try:
+            for L in proc.stdout:
+                # description lines are indented under their package line
+                if not L.strip() or L[0].isspace():
+                    continue
+                # line often like "neofetch/stable 7.1.0 all" (or "neofetch - fetch system information")
+                tok = L.split(None, 1)[0]
+                if "/" in tok:
+                    tok = tok.split("/", 1)[0]
+                elif tok.endswith(":") or L.rstrip().endswith(("...", "Done")):
+                    # "Sorting... Done", "Full Text Search...", "WARNING:" headers
+                    continue
+                if tok:
+                    found[tok] = None
+                    if len(found) >= PKG_SEARCH_MAX_CANDIDATES:
+                        break
+        finally:
+            killer.cancel()
+            if proc.poll() is None:
+                proc.terminate()
+            proc.stdout.close()
+            proc.wait()
+        uniq = list(found)
+        cache[name] = uniq
+        return tuple(uniq)
+    except (OSError, subprocess.SubprocessError) as e:
         log(f"[pkg_search_candidates] search failed for {name}: {e}", to_console=False)
-        return []
+        return ()
 
-def choose_best_package(name: str, candidates: list[str], cutoff: float = PKG_NAME_CONFIDENCE) -> str | None:
+@functools.lru_cache(maxsize=512)
+def choose_best_package(name: str, candidates: Tuple[str, ...], cutoff: float = PKG_NAME_CONFIDENCE) -> str | None:
     if not candidates:
         return None
-    match = difflib.get_close_matches(name, candidates, n=1, cutoff=cutoff)
-    if match:
-        return match[0]
-    return None
+    # an exact hit always scores 1.0; skip the fuzzy pass
+    if name in candidates:
+        return name
+    return closest_match(name, candidates, cutoff=cutoff)
 
 # ---------------------------------------------------------------------------
-# GitHub search (uses curl; set GITHUB_TOKEN env var for higher rate limits)
+# GitHub search (urllib + on-disk ETag cache; set GITHUB_TOKEN env var for higher rate limits)
 # ---------------------------------------------------------------------------
+_LINK_REL_RE = re.compile(r'<([^>]+)>;\s*rel="([^"]+)"')
+
+def _link_has_next(link: Optional[str]) -> bool:
+    # GitHub omits the Link header entirely when everything fits on one page
+    return any(rel == "next" for _, rel in _LINK_REL_RE.findall(link or ""))
+
+def _gh_cache_file(key: str) -> Path:
+    return GH_CACHE_DIR / (hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+def _gh_cache_get(key: str) -> Optional[Dict]:
+    """Return cached {"etag", "body", "next", "ts"} for a request key, or None."""
+    try:
+        with open(_gh_cache_file(key), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        return entry if isinstance(entry, dict) and "body" in entry else None
+    except (OSError, ValueError):
+        return None
+
+def _gh_cache_put(key: str, etag: Optional[str], body: str, has_next: Optional[bool]) -> None:
+    try:
+        GH_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(_gh_cache_file(key), "w", encoding="utf-8") as f:
+            json.dump({"etag": etag, "body": body, "next": has_next, "ts": time.time()}, f)
+    except OSError as e:
+        log(f"[search_github_repos] cache write failed: {e}", to_console=False, category="interactive")
+
 def search_github_repos(query: str, per_page: int = GITHUB_PER_PAGE, max_total: int = GITHUB_SEARCH_LIMIT) -> List[Tuple[str, str]]:
     """
-    Returns list of (full_name, html_url). Uses GitHub Search API via curl.
+    Returns list of (full_name, html_url). Uses GitHub Search API over one
+    keep-alive HTTPS connection for all pages; pagination follows the Link rel="next" header.
+    Pages are cached on disk: reused as-is for GITHUB_CACHE_TTL, then revalidated
+    with If-None-Match (a 304 reuses the cached body).
     This is a best-effort helper for interactive mode. Set GITHUB_TOKEN env var to increase rate limits.
     """
+    conn: Optional[http.client.HTTPSConnection] = None
     try:
         token = os.environ.get("GITHUB_TOKEN")
         results = []
         fetched = 0
         page = 1
         while fetched < max_total:
-            url = f"https://api.github.com/search/repositories?q={shlex.quote(query)}&per_page={per_page}&page={page}"
-            headers = ""
-            if token:
-                headers = f"-H 'Authorization: token {token}' -H 'Accept: application/vnd.github.v3+json'"
-            cmd = f"curl -s {headers} {shlex.quote(url)}"
-            out = subprocess.run(["bash", "-lc", cmd], capture_output=True, text=True, timeout=15)
-            if out.returncode != 0:
-                break
+            params = urllib.parse.urlencode({"q": query, "per_page": per_page, "page": page})
+            path = f"/search/repositories?{params}"
+            url = f"https://{GITHUB_API_HOST}{path}"
+            cached = _gh_cache_get(url)
+            remaining = None
+            has_next = cached.get("next") if cached else None
+            if cached and time.time() - cached.get("ts", 0) < GITHUB_CACHE_TTL:
+                body = cached["body"]
+            else:
+                headers = {"Accept": "application/vnd.github.v3+json", "User-Agent": "termux-power-suite"}
+                if token:
+                    headers["Authorization"] = f"token {token}"
+                if cached and cached.get("etag"):
+                    headers["If-None-Match"] = cached["etag"]
+                try:
+                    if conn is None:
+                        conn = http.client.HTTPSConnection(GITHUB_API_HOST, timeout=15)
+                    conn.request("GET", path, headers=headers)
+                    resp = conn.getresponse()
+                    # always drain the body so the connection can serve the next page
+                    raw = resp.read()
+                except (OSError, http.client.HTTPException) as e:
+                    log(f"[search_github_repos] request for page {page} failed: {e}", to_console=False, category="interactive")
+                    break
+                remaining = resp.getheader("X-RateLimit-Remaining")
+                if resp.status == 200:
+                    body = raw.decode("utf-8")
+                    has_next = _link_has_next(resp.getheader("Link"))
+                    _gh_cache_put(url, resp.getheader("ETag"), body, has_next)
+                elif resp.status == 304 and cached:
+                    # not modified: cached copy (and its Link info) is still current
+                    body = cached["body"]
+                    _gh_cache_put(url, cached.get("etag"), body, has_next)
+                else:
+                    log(f"[search_github_repos] HTTP {resp.status} for page {page}", to_console=False, category="interactive")
+                    break
             try:
-                data = json.loads(out.stdout)
-            except Exception:
+                data = json.loads(body)
+            except ValueError:
                 break
             items = data.get("items", []) or []
             if not items:
@@ -353,18 +795,27 @@ def search_github_repos(query: str, per_page: int = GITHUB_PER_PAGE, max_total:
                     fetched += 1
                     if fetched >= max_total:
                         break
-            if len(items) < per_page:
+            if has_next is False:
+                break
+            if has_next is None and len(items) < per_page:
+                # cache entry from before Link tracking: fall back to the short-page check
+                break
+            if remaining == "0":
+                log("[search_github_repos] GitHub rate limit reached; stopping pagination.", to_console=False, category="interactive")
                 break
             page += 1
         return results
     except Exception as e:
-        log(f"[search_github_repos] failed: {e}", to_console=False)
+        log(f"[search_github_repos] failed: {e}", to_console=False, category="interactive")
         return []
+    finally:
+        if conn is not None:
+            conn.close()
 
 # ---------------------------------------------------------------------------
 # Interactive candidate menu & action runner
 # ---------------------------------------------------------------------------
-def interactive_candidates_menu(name: str, pkg_cands: List[str], gh_cands: List[Tuple[str,str]]) -> List[Tuple[str,str]]:
+def interactive_candidates_menu(name: str, pkg_cands: Tuple[str, ...], gh_cands: List[Tuple[str,str]]) -> List[Tuple[str,str]]:
     """
     Show a numbered menu combining pkg candidates and GitHub repos.
     Returns list of chosen actions: tuples ('pkg', pkgname) or ('git', repo_url).
@@ -422,55 +873,76 @@ def interactive_candidates_menu(name: str, pkg_cands: List[str], gh_cands: List[
                     chosen.append(mapping[n])
             except Exception:
                 continue
-    return chosen
+    # overlapping picks (e.g. "1-3,2") must not install/clone twice
+    return list(dict.fromkeys(chosen))
 
 def run_chosen_actions(actions: List[Tuple[str,str]]) -> None:
     """
     Executes chosen actions:
-      - ('pkg', name) => runs pkg install for that name
-      - ('git', url) => clones repo into TOOLS_DIR (shallow)
+      - ('pkg', name) => installs the names that aren't installed yet, in one transaction
+      - ('git', url) => clones repo into TOOLS_DIR (shallow, up to GIT_CLONE_WORKERS at once)
     """
     ensure_dirs()
-    for typ, val in actions:
-        if typ == "pkg":
-            cmd = f"pkg install -y {shlex.quote(val)} 2>&1 | tee -a {shlex.quote(str(LOGFILE))}"
-            try:
-                log(f"[interactive] Installing pkg: {val}")
-                run_with_retry(cmd, max_retries=MAX_RETRIES, timeout=CMD_TIMEOUT)
-            except Exception as e:
-                log(f"[interactive] Failed to install pkg {val}: {e}")
-        elif typ == "git":
-            dest_name = os.path.basename(val.rstrip("/")).replace(".git","")
-            dest = TOOLS_DIR / dest_name
-            try:
-                log(f"[interactive] Cloning {val} -> {dest}")
-                cmd = f"git clone --depth 1 {shlex.quote(val)} {shlex.quote(str(dest))}"
-                run_with_retry(cmd, max_retries=3, timeout=300)
-                # optional installs
-                if (dest / "requirements.txt").exists():
-                    run_with_retry(f"(cd {shlex.quote(str(dest))} && pip install -r requirements.txt) 2>&1 | tee -a {shlex.quote(str(LOGFILE))}", max_retries=2, timeout=300)
-                if (dest / "install.sh").exists():
-                    run_with_retry(f"(cd {shlex.quote(str(dest))} && bash install.sh) 2>&1 | tee -a {shlex.quote(str(LOGFILE))}", max_retries=1, timeout=300)
-            except Exception as e:
-                log(f"[interactive] Git clone failed for {val}: {e}")
+    pkgs = [val for typ, val in actions if typ == "pkg"]
+    if pkgs:
+        # one installed-package snapshot instead of an apt run per already-present name
+        installed = installed_pkgs()
+        for val in pkgs:
+            if val in installed:
+                log(f"[interactive] {val} is already installed", category="interactive")
+        todo = [val for val in pkgs if val not in installed]
+        if todo:
+            log(f"[interactive] Installing pkg: {' '.join(todo)}", category="interactive")
+            # a failed transaction falls back to one package at a time
+            if not install_pkg_chunks([(todo, pkg_install_argv(todo))]):
+                log(f"[interactive] Failed to install some of: {' '.join(todo)}", category="interactive")
+            invalidate_installed_pkgs()
+    git_urls = [val for typ, val in actions if typ == "git"]
+    if git_urls:
+        # clones hit different hosts and share no lock: overlap them
+        with ThreadPoolExecutor(max_workers=min(GIT_CLONE_WORKERS, len(git_urls))) as pool:
+            list(pool.map(clone_tool, git_urls))
+
+def clone_tool(url: str) -> None:
+    """Shallow-clone url into TOOLS_DIR, then run its requirements.txt / install.sh if present."""
+    dest_name = os.path.basename(url.rstrip("/")).replace(".git","")
+    dest = TOOLS_DIR / dest_name
+    try:
+        log(f"[interactive] Cloning {url} -> {dest}", category="interactive")
+        run_with_retry_argv(["git", "-c", "protocol.version=2", "clone", "--filter=blob:none", "--depth=1",
+                             "--single-branch", "--no-tags", url, str(dest)], max_retries=3, timeout=300)
+        # optional installs
+        if (dest / "requirements.txt").exists():
+            # concurrent clones share one site-packages
+            with PIP_LOCK:
+                run_with_retry_argv(["pip", "install", *PIP_INSTALL_FLAGS, "-r", "requirements.txt"], max_retries=2, timeout=300, cwd=dest)
+        if (dest / "install.sh").exists():
+            run_with_retry_argv(["bash", "install.sh"], max_retries=1, timeout=300, cwd=dest)
+    except Exception as e:
+        log(f"[interactive] Git clone failed for {url}: {e}", category="interactive")
 
 # ---------------------------------------------------------------------------
 # Integrate interactive resolver into prepare_command_for_run
 # ---------------------------------------------------------------------------
+# per-run decisions of resolve_pkg_interactive: each token is searched (and asked about) once
+_RESOLVE_MEMO: Dict[str, bool] = {}
+
 def resolve_pkg_interactive(ptoken: str) -> bool:
     """
     Attempt to resolve a package token interactively (for AUTO_CORRECT_MODE in ask/ai).
     If resolution performed (install or clone), returns True.
     Otherwise returns False (caller can proceed with default behavior).
+    The result is remembered for the rest of the run.
     """
+    if ptoken not in _RESOLVE_MEMO:
+        _RESOLVE_MEMO[ptoken] = _resolve_pkg_interactive(ptoken)
+    return _RESOLVE_MEMO[ptoken]
+
+def _resolve_pkg_interactive(ptoken: str) -> bool:
     # 1) check exact installed/available
-    try:
-        rc = subprocess.run(["bash", "-lc", f"pkg list-installed 2>/dev/null | awk '{{print $1}}' | grep -xq {shlex.quote(ptoken)}"], capture_output=True, text=True, timeout=8)
-        if rc.returncode == 0:
-            log(f"[resolve] {ptoken} already installed (exact match).")
-            return True
-    except Exception:
-        pass
+    if is_pkg_installed(ptoken):
+        log(f"[resolve] {ptoken} already installed (exact match).", category="interactive")
+        return True
 
     # 2) search pkg candidates
     pkg_cands = pkg_search_candidates(ptoken)
@@ -488,12 +960,13 @@ def resolve_pkg_interactive(ptoken: str) -> bool:
         if best:
             # install best automatically
             try:
-                cmd = f"pkg install -y {shlex.quote(best)} 2>&1 | tee -a {shlex.quote(str(LOGFILE))}"
-                log(f"[pkg-autocorrect] auto-install '{ptoken}' -> '{best}' (silent)")
-                run_with_retry(cmd, max_retries=MAX_RETRIES, timeout=CMD_TIMEOUT)
+                log(f"[pkg-autocorrect] auto-install '{ptoken}' -> '{best}' (silent)", category="autocorrect")
+                with PKG_LOCK:
+                    run_with_retry_argv(pkg_install_argv([best]), max_retries=MAX_RETRIES, timeout=CMD_TIMEOUT)
+                invalidate_installed_pkgs()
                 return True
             except Exception as e:
-                log(f"[pkg-autocorrect] install failed for {best}: {e}")
+                log(f"[pkg-autocorrect] install failed for {best}: {e}", category="autocorrect")
         return False
 
     # 5) interactive flows (ask or ai)
@@ -504,13 +977,17 @@ def resolve_pkg_interactive(ptoken: str) -> bool:
     # Show interactive menu combining both lists (limit shown)
     chosen = interactive_candidates_menu(ptoken, pkg_cands, gh_cands)
     if not chosen:
-        log(f"[resolve] User cancelled or no selection for '{ptoken}'")
+        log(f"[resolve] User cancelled or no selection for '{ptoken}'", category="interactive")
         return False
 
     # run chosen actions
     run_chosen_actions(chosen)
     return True
 
+# shell operators that end the argument list of an install command (redirects, pipes, &&,
+# substitutions); '=' is not one of them - it appears inside 'name=version' and '-oKey=value'
+SHELL_OPERATORS = frozenset("|&;<>()$`")
+
 def prepare_command_for_run(cmd: str) -> str:
     """
     Apply autocorrect_command first, then special handling for pkg/apt install:
@@ -518,12 +995,17 @@ def prepare_command_for_run(cmd: str) -> str:
     - If a better package name is found via pkg_search_candidates and confidence, replace it.
     - If interactive/ai mode requested, prompt user and possibly run actions directly.
     """
-    orig = cmd
-    cmd = autocorrect_command(cmd)
-    parts = cmd.strip().split()
+    parts = cmd.split()
     if not parts:
         return cmd
-    if parts[0] in ("pkg", "apt"):
+    fixed = autocorrect_command(cmd, parts)
+    if fixed is not cmd:
+        # re-split only when autocorrect actually rewrote (or the user accepted) something
+        cmd = fixed
+        parts = cmd.split()
+        if not parts:
+            return cmd
+    if parts[0] in ("pkg", "apt", "apt-get"):
         try:
             for idx, tok in enumerate(parts):
                 if tok in ("install", "i"):
@@ -535,16 +1017,22 @@ def prepare_command_for_run(cmd: str) -> str:
             inst_idx = None
 
         if inst_idx is not None and inst_idx + 1 < len(parts):
-            pkg_tokens = []
-            # collect tokens after install until an option starts (-) or end
-            for t in parts[inst_idx+1:]:
-                if t.startswith("-"):
-                    break
-                pkg_tokens.append(t)
+            # arguments after install, up to any shell syntax (redirects, pipes, &&);
+            # options like -y are kept but aren't package names
+            tail = parts[inst_idx+1:]
+            end = next((i for i, t in enumerate(tail) if SHELL_OPERATORS.intersection(t)), len(tail))
+            flags = [t for t in tail[:end] if t.startswith("-")]
+            pkg_tokens = [t for t in tail[:end] if not t.startswith("-")]
+            if AUTO_CORRECT_MODE == "silent" and all(
+                "=" in t or t in PKGS_SET or is_pkg_installed(t) or t in known_pkg_names() for t in pkg_tokens
+            ):
+                # nothing to resolve: every name is installed or exists in the repo
+                return cmd
             fixed_tokens = []
             # for each token, maybe interactively resolve
             for ptoken in pkg_tokens:
-                if "/" in ptoken or ptoken.startswith("http"):
+                # paths/URLs and version-pinned specs (name=version) are taken as written
+                if "/" in ptoken or "=" in ptoken or ptoken.startswith("http"):
                     fixed_tokens.append(ptoken)
                     continue
                 # if interactive resolve handles it (installs/clones) then skip adding token
@@ -553,168 +1041,468 @@ def prepare_command_for_run(cmd: str) -> str:
                     try:
                         handled = resolve_pkg_interactive(ptoken)
                     except Exception as e:
-                        log(f"[resolve] interactive resolution error for {ptoken}: {e}")
+                        log(f"[resolve] interactive resolution error for {ptoken}: {e}", category="interactive")
                     if handled:
                         # already installed/handled by interactive, do not add to pkg install command
                         continue
-                # fallback: check if exact installed (then skip)
-                try:
-                    rc = subprocess.run(["bash", "-lc", f"pkg list-installed 2>/dev/null | awk '{{print $1}}' | grep -xq {shlex.quote(ptoken)}"], capture_output=True, text=True, timeout=8)
-                    if rc.returncode == 0:
-                        fixed_tokens.append(ptoken)
-                        continue
-                except Exception:
-                    pass
+                # fallback: installed or one of our own known-good names (then skip)
+                if ptoken in PKGS_SET or is_pkg_installed(ptoken):
+                    fixed_tokens.append(ptoken)
+                    continue
                 # search candidates and choose best
                 cands = pkg_search_candidates(ptoken)
                 best = choose_best_package(ptoken, cands, cutoff=PKG_NAME_CONFIDENCE)
                 if best and AUTO_CORRECT_MODE == "silent":
-                    log(f"[pkg-autocorrect] '{ptoken}' -> '{best}' (auto, silent)")
+                    log(f"[pkg-autocorrect] '{ptoken}' -> '{best}' (auto, silent)", category="autocorrect")
                     fixed_tokens.append(best)
                 else:
                     fixed_tokens.append(ptoken)
             # rebuild command with replaced package tokens
-            new_parts = parts[:inst_idx+1] + fixed_tokens
-            after_idx = inst_idx + 1 + len(pkg_tokens)
-            if after_idx < len(parts):
-                new_parts += parts[after_idx:]
+            # several typos may resolve to the same package
+            new_parts = parts[:inst_idx+1] + flags + unique(fixed_tokens) + tail[end:]
             new_cmd = " ".join(new_parts)
             if new_cmd != cmd:
-                log(f"[prepare_command] rewritten: '{cmd}' -> '{new_cmd}'")
+                log(f"[prepare_command] rewritten: '{cmd}' -> '{new_cmd}'", category="autocorrect")
             return new_cmd
     return cmd
 
 # ---------------------------------------------------------------------------
 # Package installation (auto-heavy: always proceed), using prepare_command_for_run
 # ---------------------------------------------------------------------------
+# Termux packages installed by install_packages(), deduplicated once at import;
+# PKGS_SET for membership checks
+PKGS: Tuple[str, ...] = tuple(unique_pinned((
+    # core
+    "coreutils", "util-linux", "ncurses-utils", "termux-api", "termux-keyring",
+    "curl", "wget", "git", "tree", "neofetch", "tsu", "tmux", "screen", "nano", "vim",
+    # programming
+    "python", "python-pip", "clang", "make", "gdb", "php", "ruby", "perl",
+    "nodejs", "golang", "rust", "lua",
+    "openjdk-17", "sqlite", "yasm", "cmake", "pkg-config", "git-lfs", "uv",
+    # network / security (legal use only)
+    "nmap", "ncat", "dnsutils", "traceroute", "mtr", "whois", "tcpdump", "openssl", "iproute2",
+    "inetutils", "openvpn", "tor", "torsocks", "proxychains-ng", "hydra", "sqlmap", "metasploit", "iperf3",
+    # wifi / api
+    "jq", "iw", "speedtest-cli", "speedtest",
+    # visual / fun
+    "cmatrix", "cowsay", "figlet", "toilet", "lolcat", "screenfetch", "ranger", "htop",
+    # browsers / downloaders
+    "lynx", "w3m", "httrack", "aria2", "lftp",
+    # shell/ui
+    "zsh", "fish", "starship", "fd", "ripgrep", "bat", "fzf", "mc", "tree-sitter",
+    # unix utils
+    "sed", "grep", "gawk", "findutils", "tar", "gzip", "bzip2", "xz-utils", "p7zip", "diffutils", "zip", "unzip",
+    # misc
+    "ncdu", "pv", "curlftpfs", "clang-dev", "man", "man-pages", "lazygit", "silversearcher-ag",
+)))
+PKGS_SET = frozenset(bare_name(p) for p in PKGS)
+# what the pip group runs on: installed in a transaction of their own before it starts
+PIP_PREREQS = frozenset({"python", "python-pip", "uv"})
+# python modules (one pip resolver run for all of them)
+PIPS: Tuple[str, ...] = tuple(unique_pinned(("speedtest-cli", "colorama", "python-whois", "tqdm", "pyfiglet", "requests"),
+                                            key=_pip_canonical))
+# packages from other managers, installed once the pkg chunks have brought nodejs/ruby:
+# (manager, package) pairs, and per manager its install argv prefix and lock
+EXTRA_PKGS: Tuple[Tuple[str, str], ...] = (("npm", "fast-cli"), ("gem", "lolcat"))
+EXTRA_MANAGERS: Dict[str, Tuple[Tuple[str, ...], threading.Lock]] = {
+    "npm": (("npm", "install", "-g"), NPM_LOCK),
+    "gem": (("gem", "install"), GEM_LOCK),
+}
+# wheels over sdists (no compiling on the phone), never prompt, skip pip's self-version check
+PIP_INSTALL_FLAGS: Tuple[str, ...] = ("--prefer-binary", "--no-input", "--disable-pip-version-check")
+# uv (when installed) fetches in parallel; these are only defaults, the environment wins
+UV_ENV_DEFAULTS: Dict[str, str] = {"UV_CONCURRENT_DOWNLOADS": "16", "UV_HTTP_TIMEOUT": "60"}
+# for pkg install/upgrade: take the maintainer's version of changed conffiles instead of
+# stopping the transaction on a prompt, and -q (log-friendly output without progress lines,
+# which run_logged would otherwise write to the install log one by one)
+APT_OPTS: Tuple[str, ...] = ("-q", "-oDpkg::Options::=--force-confnew")
+
+_INSTALLED_CACHE: Optional[frozenset] = None
+
+def installed_pkgs() -> frozenset:
+    """
+    Names of installed packages, from one bulk query per cache lifetime: 'dpkg-query -W'
+    reads dpkg's status database directly; 'pkg list-installed' (which starts apt) is
+    the fallback when dpkg-query is missing.
+    Call invalidate_installed_pkgs() after installing anything.
+    """
+    global _INSTALLED_CACHE
+    if _INSTALLED_CACHE is None:
+        use_dpkg = have("dpkg-query")
+        argv = ["dpkg-query", "-W", "-f=${db:Status-Abbrev} ${Package}\n"] if use_dpkg else ["pkg", "list-installed"]
+        try:
+            # parse the stream as it arrives instead of buffering the whole listing
+            proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            killer = threading.Timer(15, proc.kill)
+            killer.start()
+            try:
+                if use_dpkg:
+                    # "ii" = installed; other states (rc, un, ...) leave at most config files behind
+                    names = (line.split()[1] for line in proc.stdout if line.startswith("ii "))
+                else:
+                    # list-installed prints "pkgname/version ..." after a "Listing..." header
+                    names = (line.split("/", 1)[0] for line in proc.stdout if "/" in line)
+                _INSTALLED_CACHE = frozenset(names)
+            finally:
+                killer.cancel()
+                proc.stdout.close()
+                proc.wait()
+        except (OSError, subprocess.SubprocessError) as e:
+            log(f"[installed_pkgs] {argv[0]} failed: {e}", to_console=False)
+            _INSTALLED_CACHE = frozenset()
+    return _INSTALLED_CACHE
+
+def invalidate_installed_pkgs() -> None:
+    global _INSTALLED_CACHE
+    _INSTALLED_CACHE = None
+    # new packages may have put new commands on PATH
+    have.cache_clear()
+
 def is_pkg_installed(pkg: str) -> bool:
+    return pkg in installed_pkgs()
+
+def missing_pips(names: Iterable[str]) -> List[str]:
+    """
+    The modules in `names` that one 'pip list --format=freeze' call doesn't report
+    (compared by normalized project name). All of them when pip can't be asked.
+    """
+    names = list(names)
+    if not have("python"):
+        return names
     try:
-        # list-installed prints "pkgname/version ..." — we compare package name only using awk + exact match
-        rc = subprocess.run(["bash", "-lc", f"pkg list-installed 2>/dev/null | awk '{{print $1}}' | grep -xq {shlex.quote(pkg)}"], capture_output=True, text=True, timeout=10)
-        return rc.returncode == 0
-    except Exception:
-        return False
+        out = subprocess.run(["python", "-m", "pip", "list", "--format=freeze", "--disable-pip-version-check"],
+                             capture_output=True, text=True, timeout=60, check=True).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        log(f"[missing_pips] pip list failed: {e}", to_console=False)
+        return names
+    # "name==version", or "name @ url" for direct installs
+    present = {_pip_canonical(re.split(r"==| @ ", line, maxsplit=1)[0].strip()) for line in out.splitlines() if line.strip()}
+    return [n for n in names if _pip_canonical(bare_name(n)) not in present]
+
+def apt_index_age() -> float:
+    """Seconds since the apt package lists were last refreshed (inf if unknown)."""
+    try:
+        return time.time() - max(p.stat().st_mtime for p in APT_LISTS_DIR.glob("*"))
+    except (OSError, ValueError):
+        return float("inf")
 
-def install_packages() -> None:
-    log("Starting package installation (AUTO-HEAVY mode)")
-    rotate_logs()
+def upgrade_age() -> float:
+    """Seconds since the last successful 'pkg upgrade' by this script (inf if never)."""
+    try:
+        return time.time() - UPGRADE_MARKER.stat().st_mtime
+    except OSError:
+        return float("inf")
+
+# pipeline several requests per mirror connection, one queue per host, let apt itself
+# retry a dropped download before a whole transaction has to be retried, and fetch
+# zstd-compressed indexes where the mirror offers them (much faster to unpack than xz)
+APT_CONF = """\
+Acquire::Queue-Mode "host";
+Acquire::http::Pipeline-Depth "10";
+Acquire::Retries "3";
+Acquire::CompressionTypes::Order { "zst"; "xz"; "gz"; };
+"""
 
-    if not shutil.which("pkg"):
-        log("[!] 'pkg' not found on PATH. Skipping package installation.", to_console=True)
-        return
+def ensure_apt_conf() -> None:
+    """Write APT_CONF once; later runs see identical content and leave the file alone."""
+    try:
+        if APT_CONF_FILE.read_text(encoding="utf-8") == APT_CONF:
+            return
+    except OSError:
+        pass
+    try:
+        APT_CONF_FILE.parent.mkdir(parents=True, exist_ok=True)
+        APT_CONF_FILE.write_text(APT_CONF, encoding="utf-8")
+        log(f"Wrote apt download settings to {APT_CONF_FILE}", to_console=False)
+    except OSError as e:
+        log(f"[!] could not write {APT_CONF_FILE}: {e}", to_console=False)
 
-    log("[1/3] Updating Termux packages...")
+# (label, argv, required binary or None, max_retries, timeout)
+InstallStep = Tuple[str, List[str], Optional[str], int, int]
+
+def _step_marker(argv: List[str]) -> Path:
+    """Done-marker for a step: a hash of its argv and of this script's mtime (editing the script re-runs it)."""
     try:
-        cmd = f"pkg update -y | tee -a {shlex.quote(str(LOGFILE))}"
-        cmd = prepare_command_for_run(cmd)
-        run_with_retry(cmd, max_retries=2, timeout=300)
-        cmd = f"pkg upgrade -y | tee -a {shlex.quote(str(LOGFILE))}"
-        cmd = prepare_command_for_run(cmd)
-        run_with_retry(cmd, max_retries=2, timeout=600)
-        log("✔ Base packages updated.")
-    except Exception as e:
-        log(f"[!] pkg update/upgrade had persistent problems: {e}")
+        stamp = os.stat(__file__).st_mtime_ns
+    except OSError:
+        stamp = 0
+    return STEP_MARKER_DIR / hashlib.sha256(json.dumps([argv, stamp]).encode("utf-8")).hexdigest()
 
-    PKGS = [
-        # core
-        "coreutils", "util-linux", "ncurses-utils", "termux-api", "termux-keyring",
-        "curl", "wget", "git", "tree", "neofetch", "tsu", "tmux", "screen", "nano", "vim",
-        # programming
-        "python", "python2", "clang", "make", "gdb", "php", "ruby", "perl",
-        "nodejs", "golang", "rust", "lua",
-        "openjdk-17", "sqlite", "yasm", "cmake", "pkg-config", "git-lfs",
-        # network / security (legal use only)
-        "nmap", "ncat", "dnsutils", "traceroute", "mtr", "whois", "tcpdump", "openssl", "iproute2",
-        "inetutils", "openvpn", "tor", "torsocks", "proxychains-ng", "hydra", "sqlmap", "metasploit", "iperf3",
-        # wifi / api
-        "jq", "iw", "speedtest-cli", "speedtest",
-        # visual / fun
-        "cmatrix", "cowsay", "figlet", "toilet", "lolcat", "screenfetch", "ranger", "htop",
-        # browsers / downloaders
-        "lynx", "w3m", "httrack", "aria2", "lftp",
-        # shell/ui
-        "zsh", "fish", "starship", "fd", "ripgrep", "bat", "fzf", "mc", "tree-sitter",
-        # unix utils
-        "sed", "grep", "gawk", "findutils", "tar", "gzip", "bzip2", "xz-utils", "p7zip", "diffutils", "zip", "unzip",
-        # misc
-        "ncdu", "pv", "curlftpfs", "clang-dev", "man", "man-pages", "lazygit", "silversearcher-ag"
-    ]
-
-    for pkg in PKGS:
+def run_install_steps(steps: List[InstallStep], lock: threading.Lock, remember: bool = False) -> bool:
+    """
+    Run install steps in order, holding the group's lock for each one.
+    The required binary is checked at run time (an earlier step may have installed it);
+    failures are logged and don't stop the remaining steps.
+    With remember=True a successful step leaves a marker in STEP_MARKER_DIR and is skipped
+    on later runs (FORCE_INSTALL=1 runs it anyway) - for steps without a cheap installed check.
+    Returns True when no step failed.
+    """
+    ok = True
+    for label, argv, binary, retries, timeout in steps:
+        marker = _step_marker(argv) if remember else None
+        if marker and not FORCE_INSTALL and marker.exists():
+            log(f"✔ {label}: done in an earlier run. Skipped.")
+            continue
+        if binary and not have(binary):
+            log(f"{binary} not present; skipping: {label}")
+            continue
+        log(f"[*] {label}...")
         try:
-            if is_pkg_installed(pkg):
-                log(f"✔ {pkg} already installed. Skipped.")
-                continue
-            log(f"→ Installing: {pkg}")
-            # build command and run through prepare_command_for_run (for autocorrect/search)
-            raw_cmd = f"pkg install -y {shlex.quote(pkg)} 2>&1 | tee -a {shlex.quote(str(LOGFILE))}"
-            prepared = prepare_command_for_run(raw_cmd)
-            try:
-                # Note: prepare_command_for_run may have already installed/cloned the package in interactive mode
-                run_with_retry(prepared, max_retries=MAX_RETRIES, timeout=CMD_TIMEOUT)
-            except Exception as ie:
-                log(f"[!] Persistent failure installing {pkg}: {ie}. Skipping to next package.")
-                continue
+            with lock:
+                run_with_retry_argv(argv, max_retries=retries, timeout=timeout)
         except Exception as e:
-            log(f"[!] Exception during install loop for {pkg}: {e}")
+            ok = False
+            log(f"[!] {label} failed: {e}")
+            continue
+        if marker:
+            try:
+                STEP_MARKER_DIR.mkdir(parents=True, exist_ok=True)
+                marker.touch()
+            except OSError as e:
+                log(f"[!] could not write {marker}: {e}", to_console=False)
+    return ok
 
-    # pip/npm/gem installs (best-effort) — prepare_command_for_run used for corrections
-    log("[*] Upgrading pip (if available)...")
-    if shutil.which("python"):
-        try:
-            cmd = "python -m pip install --upgrade pip 2>&1 | tee -a " + shlex.quote(str(LOGFILE))
-            cmd = prepare_command_for_run(cmd)
-            run_with_retry(cmd, max_retries=2, timeout=300)
-        except Exception as e:
-            log(f"[!] pip upgrade failed: {e}")
+def run_first_success(steps: List[InstallStep], lock: threading.Lock) -> bool:
+    """Try alternative steps for the same job in order (e.g. uv, then pip); stop at the first success."""
+    return any(run_install_steps([step], lock) for step in steps)
 
-    log("[*] Installing Python speedtest-cli...")
-    if shutil.which("python"):
-        try:
-            cmd = "python -m pip install speedtest-cli --upgrade 2>&1 | tee -a " + shlex.quote(str(LOGFILE))
-            cmd = prepare_command_for_run(cmd)
-            run_with_retry(cmd, max_retries=2, timeout=300)
-        except Exception as e:
-            log(f"[!] speedtest-cli install failed: {e}")
+def pkg_install_argv(names: Iterable[str]) -> List[str]:
+    """
+    apt-get directly instead of the pkg wrapper: no extra bash start or mirror/cache
+    check per transaction (the update phase has already run pkg update when needed).
+    """
+    if have("apt-get"):
+        # options ahead of the subcommand: the argument list after 'install' is names only
+        return ["apt-get", *APT_OPTS, "install", "-y", *names]
+    return ["pkg", "install", "-y", *APT_OPTS, *names]
+
+def extra_install_plan() -> List[Tuple[InstallStep, threading.Lock]]:
+    """
+    EXTRA_PKGS as install steps: one per manager (in first-seen order) with all of its
+    packages merged into a single argv, duplicates dropped.
+    """
+    by_manager: Dict[str, List[str]] = {}
+    for manager, name in EXTRA_PKGS:
+        by_manager.setdefault(manager, []).append(name)
+    plan: List[Tuple[InstallStep, threading.Lock]] = []
+    for manager, names in by_manager.items():
+        prefix, lock = EXTRA_MANAGERS[manager]
+        names = unique(names)
+        plan.append(((f"Installing {' '.join(names)} ({manager})", prepare_argv([*prefix, *names]), manager, 2, 300), lock))
+    return plan
+
+def prepare_argv(argv: List[str]) -> List[str]:
+    """prepare_command_for_run (autocorrect + package-name resolution) for an argv list."""
+    return shlex.split(prepare_command_for_run(shlex.join(argv)))
+
+def install_pkg_chunks(chunks: List[Tuple[List[str], List[str]]]) -> bool:
+    """
+    Install (names, argv) chunks, one apt transaction each.
+    When a chunk fails, its packages are retried one at a time so a single bad name
+    doesn't cost the rest of the chunk. Returns True when everything installed.
+    """
+    ok = True
+    for n, (names, argv) in enumerate(chunks, 1):
+        label = f"Installing packages (batch {n}/{len(chunks)})"
+        if run_install_steps([(label, argv, None, MAX_RETRIES, CMD_TIMEOUT)], PKG_LOCK):
+            continue
+        log(f"[!] Batch {n} failed; installing its {len(names)} packages one by one")
+        ok = run_install_steps([(f"Installing {p}", pkg_install_argv([p]), None, 2, CMD_TIMEOUT) for p in names], PKG_LOCK) and ok
+    return ok
 
-    log("[*] Installing fast-cli (Node)...")
-    if shutil.which("npm"):
+# apt-get --print-uris: 'URI' archive-filename size hash
+_PRINT_URIS_RE = re.compile(r"^'([^']+)' (\S+) (\d+) ")
+
+def prefetch_debs(names: List[str]) -> None:
+    """
+    Download the .debs apt would fetch for `names` into its archive cache, DEB_PREFETCH_WORKERS
+    at a time, so the install transactions find them locally instead of fetching one by one.
+    Best effort: whatever fails here apt downloads as usual (and it verifies every archive's hash).
+    """
+    if not names or not have("apt-get"):
+        return
+    # one --print-uris call per install chunk: apt rejects the whole call for a single
+    # unknown or virtual name, which then only costs that chunk's prefetch
+    wanted: Dict[str, Tuple[str, str, int]] = {}
+    for i in range(0, len(names), PKG_CHUNK_SIZE):
         try:
-            cmd = "npm install -g fast-cli 2>&1 | tee -a " + shlex.quote(str(LOGFILE))
-            cmd = prepare_command_for_run(cmd)
-            run_with_retry(cmd, max_retries=2, timeout=300)
-        except Exception as e:
-            log(f"[!] fast-cli npm install failed: {e}")
-    else:
-        log("npm not present; skipping fast-cli")
+            out = subprocess.run(["apt-get", "install", "-y", "-qq", "--print-uris", *names[i:i + PKG_CHUNK_SIZE]],
+                                 capture_output=True, text=True, timeout=120).stdout
+        except (OSError, subprocess.SubprocessError) as e:
+            log(f"[prefetch_debs] apt-get --print-uris failed: {e}", to_console=False)
+            continue
+        for line in out.splitlines():
+            m = _PRINT_URIS_RE.match(line)
+            # chunks share dependencies: each archive once
+            if m and m.group(2) not in wanted and not (APT_ARCHIVES_DIR / m.group(2)).exists():
+                wanted[m.group(2)] = (m.group(1), m.group(2), int(m.group(3)))
+    if not wanted:
+        return
+    partial = APT_ARCHIVES_DIR / "partial"
+    try:
+        partial.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        log(f"[prefetch_debs] {e}", to_console=False)
+        return
 
-    log("[*] Installing lolcat (Ruby gem)...")
-    if shutil.which("gem"):
+    def fetch(item: Tuple[str, str, int]) -> bool:
+        url, name, size = item
+        tmp = partial / f"{name}.tps"
         try:
-            cmd = "gem install lolcat 2>&1 | tee -a " + shlex.quote(str(LOGFILE))
-            cmd = prepare_command_for_run(cmd)
-            run_with_retry(cmd, max_retries=2, timeout=300)
-        except Exception as e:
-            log(f"[!] gem install lolcat failed: {e}")
-    else:
-        log("gem not present; skipping lolcat gem")
+            with urllib.request.urlopen(url, timeout=60) as resp, open(tmp, "wb") as f:
+                shutil.copyfileobj(resp, f, 1 << 16)
+            if tmp.stat().st_size != size:
+                raise OSError(f"size {tmp.stat().st_size}, expected {size}")
+            os.replace(tmp, APT_ARCHIVES_DIR / name)
+            return True
+        except (OSError, http.client.HTTPException) as e:
+            log(f"[prefetch_debs] {name}: {e}", to_console=False)
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            return False
 
-    log("[3/3] Setting up storage...")
+    log(f"→ Prefetching {len(wanted)} package archives ({DEB_PREFETCH_WORKERS} at a time)...")
+    with ThreadPoolExecutor(max_workers=DEB_PREFETCH_WORKERS) as pool:
+        fetched = sum(pool.map(fetch, wanted.values()))
+    log(f"✔ Prefetched {fetched}/{len(wanted)} package archives")
+
+def run_pkg_group(chunks: List[Tuple[List[str], List[str]]], tail: List[Tuple[InstallStep, threading.Lock]]) -> bool:
+    """
+    Install the pkg chunks, then the tail steps (npm/gem) side by side.
+    The tail waits for the chunks because it needs nodejs/ruby from them;
+    the tail steps use different package managers, so they don't wait for each other.
+    Unlike the chunks (filtered against dpkg) they have no installed check, so a
+    successful tail step is remembered and skipped on later runs.
+    """
+    prefetch_debs([name for names, _ in chunks for name in names])
+    ok = install_pkg_chunks(chunks)
+    invalidate_installed_pkgs()
+    if tail:
+        with ThreadPoolExecutor(max_workers=len(tail)) as pool:
+            for fut in [pool.submit(run_install_steps, [step], lock, True) for step, lock in tail]:
+                ok = fut.result() and ok
+    return ok
+
+def install_packages(force: bool = FORCE_INSTALL) -> None:
+    log("Starting package installation (AUTO-HEAVY mode)")
+
+    try:
+        age = time.time() - INSTALL_MARKER.stat().st_mtime
+    except OSError:
+        age = float("inf")
+    if not force and age < INSTALL_MARKER_TTL:
+        log(f"✔ Package installation completed {int(age // 60)} min ago. Skipping (set FORCE_INSTALL=1 to rerun).")
+        return
+    ok = True
+
+    if not have("pkg"):
+        log("[!] 'pkg' not found on PATH. Skipping package installation.", to_console=True)
+        return
+
+    ensure_apt_conf()
+    log("[1/3] Updating Termux packages...")
     try:
-        cmd = "termux-setup-storage 2>&1 | tee -a " + shlex.quote(str(LOGFILE))
-        cmd = prepare_command_for_run(cmd)
-        run_with_retry(cmd, max_retries=2, timeout=120)
+        steps = []
+        # one index refresh and one upgrade: the refresh stays on 'pkg update' (Termux's mirror
+        # selection); 'pkg upgrade' would re-check (and may refresh) the index it just fetched,
+        # so the upgrade goes to apt-get when it's there
+        use_apt = have("apt-get")
+        if FORCE_REFRESH or apt_index_age() > APT_UPDATE_MAX_AGE:
+            steps.append(["pkg", "update", "-y"])
+        else:
+            log("✔ Package index is fresh. Skipped pkg update (set FORCE_REFRESH=1 to refresh).")
+        do_upgrade = FORCE_REFRESH or upgrade_age() > UPGRADE_MAX_AGE
+        if do_upgrade:
+            steps.append(["apt-get", *APT_OPTS, "dist-upgrade", "-y"] if use_apt else ["pkg", "upgrade", "-y", *APT_OPTS])
+        else:
+            log("✔ Packages upgraded recently. Skipped pkg upgrade (set FORCE_REFRESH=1 to upgrade).")
+        if steps:
+            # in order; a failed update stops before the upgrade
+            for argv in steps:
+                run_with_retry_argv(prepare_argv(argv), max_retries=2, timeout=900)
+            if do_upgrade:
+                UPGRADE_MARKER.touch()
+            log("✔ Base packages updated.")
     except Exception as e:
-        log(f"[!] termux-setup-storage may have failed: {e}")
+        ok = False
+        log(f"[!] pkg update/upgrade had persistent problems: {e}")
 
+    log("[2/3] Installing packages (batched pkg transactions)...")
+    # one 'pkg list-installed' snapshot for the whole list (and for prepare_command_for_run below)
+    installed = installed_pkgs()
+    missing = [p for p in PKGS if bare_name(p) not in installed]
+    log(f"✔ {len(PKGS) - len(missing)} packages already installed. Skipped.")
+    # the pip group starts alongside the pkg group, so python/pip (and uv) must be in place
+    # before it: otherwise pip runs before they're installed, or while dpkg rewrites them
+    prereqs = [p for p in missing if bare_name(p) in PIP_PREREQS]
+    if prereqs:
+        log(f"→ Installing the Python toolchain first: {' '.join(prereqs)}")
+        ok = install_pkg_chunks([(prereqs, prepare_argv(pkg_install_argv(prereqs)))]) and ok
+        invalidate_installed_pkgs()
+        missing = [p for p in missing if p not in prereqs]
+    # pkg group: apt holds one lock, and npm/gem need nodejs/ruby from the pkg chunks
+    pkg_chunks: List[Tuple[List[str], List[str]]] = []
+    if missing:
+        log(f"→ Installing {len(missing)} packages: {' '.join(missing)}")
+        # a few chunked transactions: apt resolves dependencies once per chunk, and a failing
+        # chunk stays small enough to retry package by package
+        # Note: prepare_command_for_run may have already installed/cloned some packages in interactive mode
+        for i in range(0, len(missing), PKG_CHUNK_SIZE):
+            chunk = missing[i:i + PKG_CHUNK_SIZE]
+            pkg_chunks.append((chunk, prepare_argv(pkg_install_argv(chunk))))
+    # pip/npm/gem installs (best-effort) — prepare_command_for_run used for corrections
+    pkg_tail = extra_install_plan()
+    # pip group: needs nothing from the remaining pkg chunks, runs alongside them.
+    # pip itself stays as packaged: Termux's python-pip refuses 'pip install --upgrade pip'
+    pips = missing_pips(PIPS)
+    label = "Installing Python modules"
+    pip_steps: List[InstallStep] = []
+    if not pips:
+        log("✔ Python modules already installed. Skipped.")
+    else:
+        pip_steps.append((label, prepare_argv(["python", "-m", "pip", "install", *PIP_INSTALL_FLAGS, *pips]), "python", 2, 600))
+    if pip_steps and have("uv"):
+        # uv resolves and downloads in parallel; plain pip stays as the fallback
+        for k, v in UV_ENV_DEFAULTS.items():
+            os.environ.setdefault(k, v)
+        pip_steps.insert(0, (f"{label} (uv)", prepare_argv(["uv", "pip", "install", "--system", *pips]),
+                             "uv", 1, 600))
+
+    storage_argv = prepare_argv(["termux-setup-storage"])
+
+    # phases: update/upgrade above has finished; the pkg and pip groups run side by side,
+    # and storage setup (neither apt nor pip) runs alongside them instead of after
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        groups = {pool.submit(run_pkg_group, pkg_chunks, pkg_tail): "pkg"}
+        if pip_steps:
+            groups[pool.submit(run_first_success, pip_steps, PIP_LOCK)] = "pip"
+        log("[3/3] Setting up storage (alongside the installs)...")
+        storage = pool.submit(run_with_retry_argv, storage_argv, max_retries=2, timeout=120)
+        for fut in as_completed(groups):
+            try:
+                ok = fut.result() and ok
+            except Exception as e:
+                ok = False
+                log(f"[!] {groups[fut]} install group failed: {e}")
+        try:
+            storage.result()
+        except Exception as e:
+            log(f"[!] termux-setup-storage may have failed: {e}")
+    invalidate_installed_pkgs()
+
+    if ok:
+        try:
+            INSTALL_MARKER.touch()
+        except OSError as e:
+            log(f"[!] could not write {INSTALL_MARKER}: {e}", to_console=False)
     log("✓ Full package setup finished (auto-heavy mode)")
 
 # ---------------------------------------------------------------------------
 # Tool manager (writer) - improved: shallow clone, retry, supports git/url/gist entries
 # ---------------------------------------------------------------------------
-def create_tool_manager() -> None:
-    log(f"Writing tool manager to: {TOOL_MANAGER_SCRIPT}")
-    content = r"""#!/data/data/com.termux/files/usr/bin/bash
+TOOL_MANAGER_SH = r"""#!/data/data/com.termux/files/usr/bin/bash
 # termux-tool-manager.sh
 # Reads $HOME/tools-list.txt where each non-comment line can be:
 #   git+https://github.com/user/repo.git
@@ -725,7 +1513,13 @@ set -e
 TOOLS_DIR="$HOME/tools"
 TOOL_LIST="$HOME/tools-list.txt"
 BACKUP_DIR="$HOME/tool-backups"
+INSTALL_LOCK="$TOOLS_DIR/.install.lock"
 mkdir -p "$TOOLS_DIR" "$BACKUP_DIR"
+# abort stalled transfers (< 1KB/s for 20s) so the retry loop can take over
+export GIT_HTTP_LOW_SPEED_LIMIT="${GIT_HTTP_LOW_SPEED_LIMIT:-1000}"
+export GIT_HTTP_LOW_SPEED_TIME="${GIT_HTTP_LOW_SPEED_TIME:-20}"
+# a tool's health check that runs longer than this counts as failed
+export TOOL_TEST_TIMEOUT="${TOOL_TEST_TIMEOUT:-30s}"
 
 notify() {
   title="$1"; message="$2"; id="${3:-9999}"
@@ -734,6 +1528,34 @@ notify() {
   fi
 }
 
+# run "$@" holding an exclusive lock on file $1 (parallel workers may share a tool name)
+with_lock() {
+  local lock="$1"; shift
+  if command -v flock >/dev/null 2>&1; then
+    flock -x "$lock" "$@"
+  else
+    "$@"
+  fi
+}
+
+# pip, install.sh and self-update change shared package state (dpkg lock, site-packages):
+# one worker at a time under INSTALL_LOCK; clones and downloads stay parallel
+self_update() {
+  if [ -x "$HOME/termux-self-update.sh" ]; then
+    with_lock "$INSTALL_LOCK" bash "$HOME/termux-self-update.sh" || true
+  fi
+}
+
+install_tool_deps() {
+  local path="$1"
+  if [ -f "$path/requirements.txt" ]; then
+    (cd "$path" && with_lock "$INSTALL_LOCK" pip install -r requirements.txt) || true
+  fi
+  if [ -f "$path/install.sh" ]; then
+    (cd "$path" && with_lock "$INSTALL_LOCK" bash install.sh) || true
+  fi
+}
+
 backup_tool() {
   local name="$1"; local src="$TOOLS_DIR/$name"
   if [ ! -d "$src" ]; then
@@ -741,8 +1563,16 @@ backup_tool() {
     return 0
   fi
   local ts; ts=$(date +"%Y%m%d-%H%M%S")
-  local backup_file="$BACKUP_DIR/${name}-${ts}.tar.gz"
-  if tar -czf "$backup_file" -C "$TOOLS_DIR" "$name"; then
+  # fastest available codec: multithreaded zstd, then pigz, then plain gzip
+  local backup_file compress
+  if command -v zstd >/dev/null 2>&1; then
+    backup_file="$BACKUP_DIR/${name}-${ts}.tar.zst"; compress="zstd -T0 -3"
+  elif command -v pigz >/dev/null 2>&1; then
+    backup_file="$BACKUP_DIR/${name}-${ts}.tar.gz"; compress="pigz -p 4"
+  else
+    backup_file="$BACKUP_DIR/${name}-${ts}.tar.gz"; compress="gzip"
+  fi
+  if with_lock "$BACKUP_DIR/.${name}.lock" tar -I "$compress" -cf "$backup_file" -C "$TOOLS_DIR" "$name"; then
     echo "$backup_file"
   else
     echo ""
@@ -757,7 +1587,8 @@ rollback_tool() {
   fi
   rm -rf "$TOOLS_DIR/$name"
   mkdir -p "$TOOLS_DIR"
-  if tar -xzf "$backup" -C "$TOOLS_DIR"; then
+  # tar detects the codec (gzip or zstd) from the archive itself
+  if tar -xf "$backup" -C "$TOOLS_DIR"; then
     echo "Rollback completed for $name"
     notify "Tool rollback" "Rolled back $name to previous version" 1010
     return 0
@@ -771,15 +1602,13 @@ rollback_tool() {
 git_clone_with_retry() {
   local repo="$1"; local dest="$2"; local tries=0; local max=3
   until [ $tries -ge $max ]; do
-    if git clone --depth 1 "$repo" "$dest"; then
+    if git -c protocol.version=2 clone --filter=blob:none --depth=1 --single-branch --no-tags "$repo" "$dest"; then
       notify "Tool installed" "Cloned $(basename "$repo")" 1020
       return 0
     fi
     tries=$((tries+1))
     echo "git clone failed (attempt $tries). Running self-update then retry..."
-    if [ -x "$HOME/termux-self-update.sh" ]; then
-      bash "$HOME/termux-self-update.sh" || true
-    fi
+    self_update
     sleep $((5 * tries))
   done
   return 1
@@ -788,15 +1617,14 @@ git_clone_with_retry() {
 git_pull_with_retry() {
   local dir="$1"; local tries=0; local max=3
   until [ $tries -ge $max ]; do
-    if (cd "$dir" && git pull --ff-only --rebase); then
+    # plain fetch depth: 'pull --depth=1' re-roots the shallow history and can't fast-forward
+    if git -C "$dir" -c protocol.version=2 pull --ff-only --no-tags; then
       notify "Tool updated" "Updated $(basename "$dir")" 1021
       return 0
     fi
     tries=$((tries+1))
     echo "git pull failed (attempt $tries). Running self-update then retry..."
-    if [ -x "$HOME/termux-self-update.sh" ]; then
-      bash "$HOME/termux-self-update.sh" || true
-    fi
+    self_update
     sleep $((5 * tries))
   done
   return 1
@@ -821,14 +1649,83 @@ download_url_with_retry() {
     fi
     tries=$((tries+1))
     echo "download failed (attempt $tries). Running self-update then retry..."
-    if [ -x "$HOME/termux-self-update.sh" ]; then
-      bash "$HOME/termux-self-update.sh" || true
+    self_update
+    sleep $((5 * tries))
+  done
+  return 1
+}
+
+# stream_extract_url URL DEST EXTRACTOR...: pipe the download straight into the extractor
+# (e.g. tar -xzf -), so the archive is never written to disk and unpacking overlaps the download.
+# Unpacks into a scratch dir that replaces DEST only once fetch and extract both succeeded,
+# so a failed update leaves the existing tool in place.
+stream_extract_url() {
+  local url="$1"; local dest="$2"; shift 2; local tries=0; local max=3
+  local tmp="$dest.tmp.$$"
+  until [ $tries -ge $max ]; do
+    rm -rf "$tmp"; mkdir -p "$tmp"
+    if command -v curl >/dev/null 2>&1; then
+      curl -fsSL "$url" | "$@" -C "$tmp"
+    elif command -v wget >/dev/null 2>&1; then
+      wget -qO- "$url" | "$@" -C "$tmp"
+    else
+      echo "No curl/wget available"
+      rm -rf "$tmp"
+      return 1
+    fi
+    local st=("${PIPESTATUS[@]}")
+    if [ "${st[0]}" -eq 0 ] && [ "${st[1]}" -eq 0 ]; then
+      rm -rf "$dest" && mv "$tmp" "$dest"
+      notify "Tool downloaded" "Downloaded $(basename "$url")" 1022
+      return 0
     fi
+    tries=$((tries+1))
+    echo "download/extract failed (attempt $tries: fetch=${st[0]} extract=${st[1]}). Running self-update then retry..."
+    self_update
     sleep $((5 * tries))
   done
+  rm -rf "$tmp"
   return 1
 }
 
+# unpack_file FILE DEST NAME: sniff a downloaded file by its magic bytes and unpack it
+# into DEST, or move it there as DEST/NAME when it is not an archive
+unpack_file() {
+  local f="$1"; local dest="$2"; local name="$3"
+  mkdir -p "$dest"
+  local magic; magic="$(od -An -tx1 -N6 "$f" 2>/dev/null | tr -d ' \n')"
+  local ok=0
+  case "$magic" in
+    1f8b*) tar -xzf "$f" -C "$dest" && ok=1 ;;
+    425a68*) tar -xjf "$f" -C "$dest" && ok=1 ;;
+    fd377a585a00) tar -xJf "$f" -C "$dest" && ok=1 ;;
+    504b0304*) unzip -q "$f" -d "$dest" && ok=1 ;;
+    # plain tar has no leading magic ("ustar" sits at offset 257); let tar decide
+    *) tar -tf "$f" >/dev/null 2>&1 && tar -xf "$f" -C "$dest" && ok=1 ;;
+  esac
+  if [ $ok -eq 1 ]; then
+    rm -f "$f"
+  else
+    mv "$f" "$dest/$name"
+  fi
+}
+
+# prefetch_urls: fetch every url+ entry in one aria2c batch (8 files at once, 4 connections
+# each) into PREFETCH_DIR; process_line then unpacks the local copies. Without aria2c this
+# is a no-op and the parallel process_line workers download each URL themselves.
+prefetch_urls() {
+  command -v aria2c >/dev/null 2>&1 || return 0
+  local list="$PREFETCH_DIR/urls.txt"
+  mkdir -p "$PREFETCH_DIR"
+  sed -nE 's/^[[:space:]]*url\+([^[:space:]]+).*$/\1/p' "$TOOL_LIST" \
+    | while IFS= read -r u; do printf '%s\n  out=%s\n' "$u" "$(basename "$u")"; done > "$list"
+  [ -s "$list" ] || return 0
+  echo "Prefetching $(grep -c '^  out=' "$list") URL(s) with aria2c..."
+  aria2c -q -i "$list" -d "$PREFETCH_DIR" -j 8 -x 4 -s 4 --auto-file-renaming=false \
+    --allow-overwrite=true --retry-wait=5 -m 3 \
+    || echo "aria2c prefetch incomplete; remaining URLs will be downloaded individually"
+}
+
 process_line() {
   local line="$1"
   line="$(echo "$line" | sed 's/^[ \t]*//;s/[ \t]*$//')"
@@ -842,15 +1739,44 @@ process_line() {
     echo "Processing URL: $url -> $dest"
     mkdir -p "$TOOLS_DIR"
     backup_file="$(backup_tool "${name%.*}")"
-    tmp="$dest.tmp"
-    if download_url_with_retry "$url" "$tmp"; then
-      mkdir -p "$dest"
-      if file "$tmp" | grep -q -E 'gzip|bzip2|Zip archive|tar'; then
-        tar -xzf "$tmp" -C "$dest" || (unzip -q "$tmp" -d "$dest" || true)
-        rm -f "$tmp"
+    local extract=()
+    case "$url" in
+      *.tar.gz|*.tgz) extract=(tar -xzf -) ;;
+      *.tar.bz2|*.tbz2) extract=(tar -xjf -) ;;
+      *.tar.xz|*.txz) extract=(tar -xJf -) ;;
+      *.tar) extract=(tar -xf -) ;;
+      *.zip) command -v bsdtar >/dev/null 2>&1 && extract=(bsdtar -xf -) ;;
+    esac
+    local ok=1
+    local prefetched="$PREFETCH_DIR/$name"
+    if [ -f "$prefetched" ] && [ ! -f "$prefetched.aria2" ]; then
+      # complete aria2c download (a .aria2 control file marks a partial one)
+      if [ ${#extract[@]} -gt 0 ]; then
+        # same swap as stream_extract_url: keep the old tool until the new one is unpacked
+        local tmp="$dest.tmp.$$"
+        rm -rf "$tmp"; mkdir -p "$tmp"
+        if "${extract[@]}" -C "$tmp" < "$prefetched"; then
+          rm -rf "$dest" && mv "$tmp" "$dest"
+        else
+          rm -rf "$tmp"
+          ok=0
+        fi
+        rm -f "$prefetched"
+      else
+        unpack_file "$prefetched" "$dest" "$name"
+      fi
+    elif [ ${#extract[@]} -gt 0 ]; then
+      stream_extract_url "$url" "$dest" "${extract[@]}" || ok=0
+    else
+      # unknown type (or zip without bsdtar): download first, then sniff it
+      tmp="$dest.tmp"
+      if download_url_with_retry "$url" "$tmp"; then
+        unpack_file "$tmp" "$dest" "$name"
       else
-        mv "$tmp" "$dest/$name"
+        ok=0
       fi
+    fi
+    if [ $ok -eq 1 ]; then
       notify "Tool installed" "Installed ${name%.*}" 1023
     else
       echo "Failed to download $url"
@@ -867,14 +1793,28 @@ process_line() {
     local path="$TOOLS_DIR/$name"
     echo "Processing git repo: $src -> $path"
     if [ -d "$path/.git" ]; then
-      backup_file="$(backup_tool "$name")"
+      # back up only when the pull can change something (remote HEAD moved or couldn't be read)
+      local remote_head local_head
+      remote_head="$(git -C "$path" ls-remote origin HEAD 2>/dev/null | awk '{print $1}')"
+      local_head="$(git -C "$path" rev-parse HEAD 2>/dev/null)"
+      backup_file=""
+      if [ -z "$remote_head" ] || [ "$remote_head" != "$local_head" ]; then
+        backup_file="$(backup_tool "$name")"
+      else
+        echo "$name is up to date; skipping backup"
+      fi
       if git_pull_with_retry "$path"; then
-        (cd "$path" && ( [ -f requirements.txt ] && pip install -r requirements.txt || true ) )
-        (cd "$path" && ( [ -f install.sh ] && bash install.sh || true ) )
-        if [ -f "$path/tooltest.sh" ] || [ -f "$path/test.sh" ]; then
-          (cd "$path" && bash -n tooltest.sh >/dev/null 2>&1 || true)
-          (cd "$path" && bash tooltest.sh >/dev/null 2>&1) || {
-            echo "Health check failed; rolling back $name"
+        install_tool_deps "$path"
+        # health check (tooltest.sh, else test.sh) only when the pull could change something;
+        # capped so a hanging script can't hold this worker's slot indefinitely
+        local test_script=""
+        [ -f "$path/test.sh" ] && test_script="test.sh"
+        [ -f "$path/tooltest.sh" ] && test_script="tooltest.sh"
+        if [ -n "$test_script" ] && [ -n "$backup_file" ]; then
+          local runner=(bash)
+          command -v timeout >/dev/null 2>&1 && runner=(timeout "$TOOL_TEST_TIMEOUT" bash)
+          (cd "$path" && "${runner[@]}" "$test_script" >/dev/null 2>&1) || {
+            echo "Health check $test_script failed or timed out; rolling back $name"
             rollback_tool "$name" "$backup_file"
           }
         fi
@@ -884,8 +1824,7 @@ process_line() {
       fi
     else
       if git_clone_with_retry "$src" "$path"; then
-        (cd "$path" && ( [ -f requirements.txt ] && pip install -r requirements.txt || true ) )
-        (cd "$path" && ( [ -f install.sh ] && bash install.sh || true ) )
+        install_tool_deps "$path"
       else
         echo "git clone failed for $src"
       fi
@@ -905,16 +1844,29 @@ main() {
     exit 0
   fi
 
-  while IFS= read -r line || [ -n "$line" ]; do
-    process_line "$line"
-  done < "$TOOL_LIST"
+  PREFETCH_DIR="$TOOLS_DIR/.prefetch"
+  rm -rf "$PREFETCH_DIR"
+  prefetch_urls
+
+  # up to TOOL_PARALLELISM entries at once; each worker is a fresh bash running process_line
+  local parallelism="${TOOL_PARALLELISM:-__TOOL_PARALLELISM__}"
+  [[ "$parallelism" =~ ^[1-9][0-9]*$ ]] || parallelism=__TOOL_PARALLELISM__
+  export TOOLS_DIR BACKUP_DIR PREFETCH_DIR INSTALL_LOCK
+  export -f process_line with_lock self_update install_tool_deps backup_tool rollback_tool git_clone_with_retry git_pull_with_retry download_url_with_retry stream_extract_url unpack_file notify
+  # a failed worker makes xargs exit 123; keep that status but clean up first (set -e would skip it)
+  local rc=0
+  grep -vE '^[[:space:]]*(#|$)' "$TOOL_LIST" \
+    | xargs -d '\n' -P "$parallelism" -I{} bash -c 'process_line "$@"' _ {} || rc=$?
+  rm -rf "$PREFETCH_DIR"
+  exit "$rc"
 }
 main
-"""
+""".replace("__TOOL_PARALLELISM__", str(TOOL_PARALLELISM))
+
+def create_tool_manager() -> None:
+    log(f"Writing tool manager to: {TOOL_MANAGER_SCRIPT}")
     try:
-        with open(TOOL_MANAGER_SCRIPT, "w", encoding="utf-8") as f:
-            f.write(content)
-        run_raw(["bash", "-lc", f"chmod +x {shlex.quote(str(TOOL_MANAGER_SCRIPT))}"])
+        write_exec(TOOL_MANAGER_SCRIPT, TOOL_MANAGER_SH)
         log("Tool manager written and made executable.")
     except Exception as e:
         log(f"[create_tool_manager] write failed: {e}", to_console=True)
@@ -922,20 +1874,25 @@ main
 # ---------------------------------------------------------------------------
 # Self-update script (keeps simple and safe)
 # ---------------------------------------------------------------------------
-def create_self_update() -> None:
-    log(f"Writing self-update script to: {SELF_UPDATE_SCRIPT}")
-    content = r"""#!/data/data/com.termux/files/usr/bin/bash
+SELF_UPDATE_SH = r"""#!/data/data/com.termux/files/usr/bin/bash
 set -e
 echo "[*] termux-self-update: updating package lists..."
 pkg update -y || true
 echo "[*] termux-self-update: upgrading installed packages..."
-pkg upgrade -y || true
+# apt-get directly: 'pkg upgrade' would check (and may refresh) the index again
+if command -v apt-get >/dev/null 2>&1; then
+  apt-get dist-upgrade -y -q -oDpkg::Options::=--force-confnew || true
+else
+  pkg upgrade -y || true
+fi
 echo "✔ termux-self-update completed."
 """
+
+def create_self_update() -> None:
+    log(f"Writing self-update script to: {SELF_UPDATE_SCRIPT}")
     try:
-        with open(SELF_UPDATE_SCRIPT, "w", encoding="utf-8") as f:
-            f.write(content)
-        run_raw(["bash", "-lc", f"chmod +x {shlex.quote(str(SELF_UPDATE_SCRIPT))}"])
+        write_exec(SELF_UPDATE_SCRIPT, SELF_UPDATE_SH)
+        self_update_ready.cache_clear()
         log("Self-update script created.")
     except Exception as e:
         log(f"[create_self_update] write failed: {e}", to_console=True)
@@ -943,15 +1900,20 @@ echo "✔ termux-self-update completed."
 # ---------------------------------------------------------------------------
 # Auto-maintain script
 # ---------------------------------------------------------------------------
-def create_auto_maintain() -> None:
-    log(f"Writing auto-maintain script to: {AUTO_MAINTAIN_SCRIPT}")
-    content = r"""#!/data/data/com.termux/files/usr/bin/bash
+AUTO_MAINTAIN_SH = r"""#!/data/data/com.termux/files/usr/bin/bash
 # Termux Auto Maintenance
 set -e
 LOGFILE="$HOME/termux-auto-maintain.log"
 LOCKFILE="$HOME/.termux-maintain.lock"
 DATE_NOW="$(date '+%Y-%m-%d %H:%M:%S')"
 log() { echo "$1" | tee -a "$LOGFILE"; }
+# Automatic starts (the .bashrc hook - older hooks start this on every shell) run at most
+# once per 24h. Manual runs always go ahead: from a terminal, with --force, or TPS_MAINTAIN_FORCE=1.
+STAMP="$HOME/.termux-maintain.stamp"
+if [ "${1:-}" != "--force" ] && [ "${TPS_MAINTAIN_FORCE:-}" != "1" ] && [ ! -t 1 ] \
+   && [ -f "$STAMP" ] && [ -z "$(find "$STAMP" -mmin +1440 2>/dev/null)" ]; then
+  exit 0
+fi
 if [ -e "$LOCKFILE" ]; then
   log "[!] Another maintenance process is running. Exiting."
   exit 0
@@ -960,11 +1922,23 @@ touch "$LOCKFILE"
 trap 'rm -f "$LOCKFILE"' EXIT
 log "[*] Auto maintenance started at: $DATE_NOW"
 
-# Battery-aware: requires termux-battery-status and jq
-if command -v termux-battery-status >/dev/null 2>&1 && command -v jq >/dev/null 2>&1; then
-  BAT_JSON="$(termux-battery-status 2>/dev/null || echo '{}')"
-  LEVEL="$(echo "$BAT_JSON" | jq -r '.percentage // 100' 2>/dev/null)"
-  PLUGGED="$(echo "$BAT_JSON" | jq -r '.plugged // \"UNKNOWN\"' 2>/dev/null)"
+# Offline: every network step would just burn its retries
+if command -v ping >/dev/null 2>&1 && ! ping -c1 -W2 1.1.1.1 >/dev/null 2>&1; then
+  log "[!] No network, skipping maintenance."
+  exit 0
+fi
+
+# Battery-aware: requires termux-battery-status. Its Android round-trip is slow, so the
+# reading is cached for 5 minutes and both fields come out of a single awk pass.
+BAT_CACHE="$HOME/.termux-batt.cache"
+if command -v termux-battery-status >/dev/null 2>&1; then
+  if [ -z "$(find "$BAT_CACHE" -mmin -5 2>/dev/null)" ]; then
+    termux-battery-status > "$BAT_CACHE.tmp" 2>/dev/null && mv -f "$BAT_CACHE.tmp" "$BAT_CACHE" || rm -f "$BAT_CACHE.tmp"
+  fi
+  read -r LEVEL PLUGGED < <(awk '
+    match($0, /"percentage": *[0-9]+/) { s = substr($0, RSTART, RLENGTH); sub(/.*: */, "", s); l = s }
+    match($0, /"plugged": *"[A-Z_]+"/) { s = substr($0, RSTART, RLENGTH); sub(/.*: *"/, "", s); sub(/"$/, "", s); p = s }
+    END { print (l == "" ? 100 : l), (p == "" ? "UNKNOWN" : p) }' "$BAT_CACHE" 2>/dev/null || echo "100 UNKNOWN")
   if [ "$PLUGGED" = "UNPLUGGED" ] && [ "$LEVEL" -lt 25 ]; then
     log "[!] Battery low (${LEVEL}%), skipping heavy maintenance."
     exit 0
@@ -983,35 +1957,51 @@ if [ -x "$HOME/termux-tool-manager.sh" ]; then
   nice -n 10 "$HOME/termux-tool-manager.sh" >>"$LOGFILE" 2>&1 || log "[!] Tool manager encountered errors."
 fi
 
+# 3) Runner index: "name<TAB>path" for every file in $HOME, read by the shell's command_not_found_handle
+INDEX="$HOME/.termux-runner-index.tsv"
+log "[*] Rebuilding runner index..."
+{ find "$HOME" \( -name .git -o -name node_modules \) -prune -o -type f -print 2>/dev/null || true; } \
+  | awk -F/ '{print $NF "\t" $0}' | sort > "$INDEX.tmp" && mv "$INDEX.tmp" "$INDEX" \
+  || log "[!] Runner index rebuild failed."
+
 log "[*] Auto maintenance finished at: $(date '+%Y-%m-%d %H:%M:%S')"
+# checked above and by the .bashrc hook: no automatic run for the next 24h
+touch "$STAMP"
 if command -v termux-notification >/dev/null 2>&1; then
   termux-notification -t "Termux Auto Maintain" -c "Maintenance completed at $(date '+%H:%M')" -i 9999 >/dev/null 2>&1 || true
 fi
 """
+
+def create_auto_maintain() -> None:
+    log(f"Writing auto-maintain script to: {AUTO_MAINTAIN_SCRIPT}")
     try:
-        with open(AUTO_MAINTAIN_SCRIPT, "w", encoding="utf-8") as f:
-            f.write(content)
-        run_raw(["bash", "-lc", f"chmod +x {shlex.quote(str(AUTO_MAINTAIN_SCRIPT))}"])
+        write_exec(AUTO_MAINTAIN_SCRIPT, AUTO_MAINTAIN_SH)
         log("Auto-maintain script created.")
     except Exception as e:
         log(f"[create_auto_maintain] write failed: {e}", to_console=True)
 
 # ---------------------------------------------------------------------------
-# Smart runner addition to .bashrc (auto-start auto-maintain unconditionally)
+# Smart runner addition to .bashrc (auto-start auto-maintain at most once a day)
 # ---------------------------------------------------------------------------
 def add_smart_runner() -> None:
     marker = "# ===== Smart Auto Runner (by Termux Power Suite) ====="
+    # marker file: a stat instead of reading the whole .bashrc on every run
+    if BASHRC_MARKER.exists():
+        log("Smart Auto Runner already present in ~/.bashrc — skipping")
+        return
     try:
         if BASHRC.exists():
             with open(BASHRC, "r", encoding="utf-8") as f:
                 data = f.read()
             if marker in data:
+                # added by an older run that predates the marker file
+                BASHRC_MARKER.touch()
                 log("Smart Auto Runner already present in ~/.bashrc — skipping")
                 return
         else:
             data = ""
     except Exception:
-        data = ""
+        data = None
 
     smart = r"""
 # ===== Smart Auto Runner (by Termux Power Suite) =====
@@ -1032,9 +2022,20 @@ run_file() {
     esac
 }
 command_not_found_handle() {
-    query="$1"
+    local query="$1" index="$HOME/.termux-runner-index.tsv" pick p
     shift
-    mapfile -t results < <(find "$HOME" -type f -name "$query" 2>/dev/null)
+    # exact name lookup in the index built by auto-maintain, keeping only files that still
+    # exist; a full find when there is no index yet or nothing usable in it (e.g. a file
+    # created, moved or removed since the last maintenance run)
+    local -a results=()
+    if [ -f "$index" ]; then
+        while IFS= read -r p; do
+            [ -f "$p" ] && results+=("$p")
+        done < <(awk -F'\t' -v q="$query" '$1 == q {print $2}' "$index")
+    fi
+    if [ "${#results[@]}" -eq 0 ]; then
+        mapfile -t results < <(find "$HOME" -type f -name "$query" 2>/dev/null)
+    fi
     case "${#results[@]}" in
         0)
             echo "command not found: $query"
@@ -1054,31 +2055,48 @@ command_not_found_handle() {
                 echo "No selection."
                 return 1
             fi
-            index=$((pick-1))
-            run_file "${results[$index]}" "$@"
+            run_file "${results[$((pick-1))]}" "$@"
             ;;
     esac
 }
 alias tupdate="$HOME/termux-self-update.sh"
 alias toolman="$HOME/termux-tool-manager.sh"
-alias maintain="$HOME/termux-auto-maintain.sh"
-# Silent auto-maintain on shell start (unconditional)
-($HOME/termux-auto-maintain.sh > /dev/null 2>&1 &)
+alias maintain="$HOME/termux-auto-maintain.sh --force"
+# Silent auto-maintain on shell start, at most once per 24h (stamp touched when a run finishes)
+if [ ! -f "$HOME/.termux-maintain.stamp" ] || [ -n "$(find "$HOME/.termux-maintain.stamp" -mmin +1440 2>/dev/null)" ]; then
+    ("$HOME/termux-auto-maintain.sh" > /dev/null 2>&1 &)
+fi
 # ===== End Smart Auto Runner =====
 """
     try:
-        with open(BASHRC, "a", encoding="utf-8") as f:
-            f.write("\n" + smart)
-        log("Smart Auto Runner appended to ~/.bashrc (auto-maintain will start on shell open)", to_console=True)
+        if data is None or BASHRC.is_symlink():
+            # couldn't read it (or it's a link we must not replace): plain append
+            with open(BASHRC, "a", encoding="utf-8") as f:
+                f.write("\n" + smart)
+        else:
+            # write the combined file next to it and swap it in, so a crash can't leave it half-written
+            tmp = BASHRC.with_name(BASHRC.name + ".tps-new")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data + "\n" + smart)
+            if BASHRC.exists():
+                shutil.copymode(BASHRC, tmp)
+            os.replace(tmp, BASHRC)
+        BASHRC_MARKER.touch()
+        log("Smart Auto Runner appended to ~/.bashrc (auto-maintain will start on shell open, once a day)", to_console=True)
     except Exception as e:
         log(f"[add_smart_runner] append failed: {e}", to_console=True)
 
 # ---------------------------------------------------------------------------
 # MAIN
 # ---------------------------------------------------------------------------
+def _on_sigterm(signum, frame) -> None:
+    # exit normally so atexit handlers flush the log and persist caches
+    log("Terminated (SIGTERM)", to_console=True)
+    sys.exit(128 + signum)
+
 def main() -> None:
+    signal.signal(signal.SIGTERM, _on_sigterm)
     log("Termux Power Suite (auto-heavy + retry + pkg-autocorrect + interactive-ai) started")
-    rotate_logs()
     ensure_dirs()
 
     try:
@@ -1103,7 +2121,7 @@ def main() -> None:
     log("==========================================")
     print()
     print("Open a NEW Termux session or run: source ~/.bashrc")
-    print("Auto-maintain will start automatically when you open a new shell.")
+    print("Auto-maintain will start automatically when you open a new shell (at most once a day).")
     print(f"AUTO_CORRECT_MODE={AUTO_CORRECT_MODE} (set env var to change: silent|ask|ai)")
 
 if __name__ == "__main__":